@@ -1,6 +1,8 @@
 #!/usr/bin/env conda activate whopo
 from abc import ABC, abstractmethod
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, AssistantEventHandler, NotFoundError, APIConnectionError, APIStatusError, RateLimitError, InternalServerError
+from openai.types import FileObject
+from openai.types.beta import Assistant as AssistantObject
 from rich.console import Console
 from rich.table import Table
 from rich import box, pretty, print
@@ -9,9 +11,31 @@ import os
 import zipfile
 import chardet
 import uuid
+import json
+import hashlib
+import struct
+import re
+import zlib
+import queue
+import threading
+import random
+import sqlite3
+import asyncio
+import heapq
+import itertools
+import shutil
+import glob
+import httpx
+from httpx._utils import get_environment_proxies
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from rich import print as rprint
 from rich.console import Console, Text
 from rich.text import Text
+from rich.live import Live
+from rich.panel import Panel
+from rich.console import Group
 from datetime import datetime
 import time
 pretty.install()
@@ -65,14 +89,629 @@ class ConsoleManager(IConsoleManager):
 	def print_table(self):
 		self.console.print(self.table)
 
+class ITokenBucket(ABC):
+	@abstractmethod
+	def reserve(self):
+		pass
+
+class TokenBucket(ITokenBucket):
+	def __init__(self, rate, capacity):
+		self.rate = rate
+		self.capacity = capacity
+		self.tokens = capacity
+		self.updated_at = time.monotonic()
+		self.paused_until = 0.0
+		self.lock = threading.Lock()
+
+	def refill(self, now):
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+		self.updated_at = now
+
+	def reserve(self):
+		# Take a token now, possibly going into debt, and return how long the caller must wait for it;
+		# callers that queue up behind each other are spaced out at exactly the bucket rate
+		with self.lock:
+			now = time.monotonic()
+			self.refill(now)
+			self.tokens -= 1
+			wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+			return max(wait, self.paused_until - now)
+
+	def pause_until(self, until):
+		with self.lock:
+			self.paused_until = max(self.paused_until, until)
+
+	def update(self, rate, available):
+		with self.lock:
+			self.refill(time.monotonic())
+			self.rate = rate
+			self.tokens = min(self.tokens, available)
+
+class IRateLimitScheduler(ABC):
+	@abstractmethod
+	def before_request(self, request):
+		pass
+
+	@abstractmethod
+	def after_response(self, response):
+		pass
+
+class RateLimitScheduler(IRateLimitScheduler):
+	ENDPOINT_CLASSES = (
+		('files', ('/files', '/uploads')),
+		('runs', ('/runs',)),
+		('messages', ('/messages',)),
+	)
+	DEFAULT_RATES = {'files': 5.0, 'runs': 10.0, 'messages': 10.0, 'default': 10.0}
+
+	def __init__(self, rates=None, burst=5):
+		rates = dict(self.DEFAULT_RATES, **(rates or {}))
+		self.buckets = {endpoint_class: TokenBucket(rate, burst) for endpoint_class, rate in rates.items()}
+
+	@staticmethod
+	def parse_duration(value):
+		# Reset headers look like "20ms", "1s" or "6m0.5s"
+		units = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+		return sum(float(amount) * units[unit] for amount, unit in re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value or ''))
+
+	def bucket(self, request):
+		path = request.url.path
+		for endpoint_class, fragments in self.ENDPOINT_CLASSES:
+			if any(fragment in path for fragment in fragments):
+				return self.buckets[endpoint_class]
+		return self.buckets['default']
+
+	def before_request(self, request):
+		wait = self.bucket(request).reserve()
+		if wait > 0:
+			time.sleep(wait)
+
+	async def before_request_async(self, request):
+		wait = self.bucket(request).reserve()
+		if wait > 0:
+			await asyncio.sleep(wait)
+
+	def after_response(self, response):
+		bucket = self.bucket(response.request)
+		headers = response.headers
+		now = time.monotonic()
+
+		limit = headers.get('x-ratelimit-limit-requests')
+		remaining = headers.get('x-ratelimit-remaining-requests')
+		reset = self.parse_duration(headers.get('x-ratelimit-reset-requests'))
+		if limit is not None and remaining is not None:
+			limit, remaining = int(limit), int(remaining)
+			if remaining <= 0:
+				bucket.pause_until(now + reset)
+			elif reset > 0 and limit > remaining:
+				# The server refills (limit - remaining) requests over `reset` seconds, so match that rate.
+				# Limits are per minute, so one odd sample never slows the bucket below limit / 60
+				bucket.update(max((limit - remaining) / reset, limit / 60), remaining)
+
+		remaining_tokens = headers.get('x-ratelimit-remaining-tokens')
+		if remaining_tokens is not None and int(remaining_tokens) <= 0:
+			bucket.pause_until(now + self.parse_duration(headers.get('x-ratelimit-reset-tokens')))
+
+		if response.status_code == 429:
+			retry_after = headers.get('retry-after-ms')
+			retry_after = float(retry_after) / 1000 if retry_after else float(headers.get('retry-after') or 1)
+			bucket.pause_until(now + retry_after)
+
+	async def after_response_async(self, response):
+		self.after_response(response)
+
+	def event_hooks(self):
+		return {'request': [self.before_request], 'response': [self.after_response]}
+
+	def async_event_hooks(self):
+		return {'request': [self.before_request_async], 'response': [self.after_response_async]}
+
+	def http_client(self, **client_options):
+		return httpx.Client(event_hooks=self.event_hooks(), **client_options)
+
+	def async_http_client(self, **client_options):
+		return httpx.AsyncClient(event_hooks=self.async_event_hooks(), **client_options)
+
+class IMetricsRegistry(ABC):
+	@abstractmethod
+	def record(self, method, path, status, seconds, bytes_sent):
+		pass
+
+	@abstractmethod
+	def snapshot(self):
+		pass
+
+class MetricsRegistry(IMetricsRegistry):
+	LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+	RETRYABLE_STATUSES = (408, 409, 429)
+	ID_PATTERN = re.compile(r'/(asst|thread|msg|run|step|file|upload|part|call)[_-][A-Za-z0-9]+')
+	_default = None
+
+	def __init__(self, buckets=LATENCY_BUCKETS):
+		self.buckets = tuple(buckets)
+		self.endpoints = {}
+		self.lock = threading.Lock()
+
+	@classmethod
+	def default(cls):
+		if cls._default is None:
+			cls._default = cls()
+		return cls._default
+
+	@classmethod
+	def endpoint(cls, method, path):
+		# Ids are folded into placeholders so every thread, run and file shares one series
+		path = cls.ID_PATTERN.sub(lambda match: f'/{{{match.group(1)}_id}}', path)
+		return f"{method} {path[3:] if path.startswith('/v1/') else path}"
+
+	def entry(self, endpoint):
+		if endpoint not in self.endpoints:
+			self.endpoints[endpoint] = {
+				'buckets': [0] * len(self.buckets),
+				'latency_sum': 0.0,
+				'requests': 0,
+				'statuses': {},
+				'errors': 0,
+				'retries': 0,
+				'bytes_sent': 0,
+				'bytes_received': 0,
+			}
+		return self.endpoints[endpoint]
+
+	def record(self, method, path, status, seconds, bytes_sent):
+		# status is the HTTP status code, or the exception name when no response arrived
+		failed = not isinstance(status, int) or status >= 400
+		retryable = not isinstance(status, int) or status in self.RETRYABLE_STATUSES or status >= 500
+		endpoint = self.endpoint(method, path)
+		with self.lock:
+			entry = self.entry(endpoint)
+			for index, bound in enumerate(self.buckets):
+				if seconds <= bound:
+					entry['buckets'][index] += 1
+					break
+			entry['latency_sum'] += seconds
+			entry['requests'] += 1
+			entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+			entry['errors'] += failed
+			entry['retries'] += retryable
+			entry['bytes_sent'] += bytes_sent
+		return endpoint
+
+	def record_received(self, endpoint, bytes_received):
+		with self.lock:
+			self.entry(endpoint)['bytes_received'] += bytes_received
+
+	def snapshot(self):
+		with self.lock:
+			return {endpoint: dict(entry, buckets=list(entry['buckets']), statuses=dict(entry['statuses'])) for endpoint, entry in self.endpoints.items()}
+
+	@staticmethod
+	def labels(**labels):
+		escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+		return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+	def render_prometheus(self):
+		snapshot = self.snapshot()
+		lines = [
+			'# HELP openai_client_request_duration_seconds Time from sending an API request to receiving its response headers.',
+			'# TYPE openai_client_request_duration_seconds histogram',
+		]
+		for endpoint, entry in snapshot.items():
+			cumulative = 0
+			for bound, count in zip(self.buckets, entry['buckets']):
+				cumulative += count
+				lines.append(f"openai_client_request_duration_seconds_bucket{self.labels(endpoint=endpoint, le=bound)} {cumulative}")
+			lines.append(f"openai_client_request_duration_seconds_bucket{self.labels(endpoint=endpoint, le='+Inf')} {entry['requests']}")
+			lines.append(f"openai_client_request_duration_seconds_sum{self.labels(endpoint=endpoint)} {entry['latency_sum']}")
+			lines.append(f"openai_client_request_duration_seconds_count{self.labels(endpoint=endpoint)} {entry['requests']}")
+
+		lines += ['# HELP openai_client_requests_total API requests by endpoint and response status.', '# TYPE openai_client_requests_total counter']
+		for endpoint, entry in snapshot.items():
+			for status, count in entry['statuses'].items():
+				lines.append(f"openai_client_requests_total{self.labels(endpoint=endpoint, status=status)} {count}")
+
+		counters = (
+			('errors', 'openai_client_errors_total', 'API requests that failed with an HTTP error or no response.'),
+			('retries', 'openai_client_retries_total', 'Failed attempts of a kind the SDK retries (408, 409, 429, 5xx, connection errors).'),
+			('bytes_sent', 'openai_client_request_bytes_total', 'Request body bytes sent.'),
+			('bytes_received', 'openai_client_response_bytes_total', 'Response body bytes received, as sent on the wire.'),
+		)
+		for key, name, description in counters:
+			lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+			for endpoint, entry in snapshot.items():
+				lines.append(f"{name}{self.labels(endpoint=endpoint)} {entry[key]}")
+		return '\n'.join(lines) + '\n'
+
+class CountingStream(httpx.SyncByteStream):
+	def __init__(self, stream, on_close=None):
+		self.stream = stream
+		self.on_close = on_close
+		self.size = 0
+
+	def __iter__(self):
+		for chunk in self.stream:
+			self.size += len(chunk)
+			yield chunk
+
+	def close(self):
+		try:
+			self.stream.close()
+		finally:
+			if self.on_close is not None:
+				self.on_close(self.size)
+
+class AsyncCountingStream(httpx.AsyncByteStream):
+	def __init__(self, stream, on_close=None):
+		self.stream = stream
+		self.on_close = on_close
+		self.size = 0
+
+	async def __aiter__(self):
+		async for chunk in self.stream:
+			self.size += len(chunk)
+			yield chunk
+
+	async def aclose(self):
+		try:
+			await self.stream.aclose()
+		finally:
+			if self.on_close is not None:
+				self.on_close(self.size)
+
+class InstrumentedTransport(httpx.BaseTransport):
+	def __init__(self, transport, metrics):
+		self.transport = transport
+		self.metrics = metrics
+
+	def handle_request(self, request):
+		# Bodies are counted as they are read, so chunked uploads and streamed downloads are measured too
+		request.stream = request_stream = CountingStream(request.stream)
+		started_at = time.perf_counter()
+		try:
+			response = self.transport.handle_request(request)
+		except Exception as error:
+			self.metrics.record(request.method, request.url.path, type(error).__name__, time.perf_counter() - started_at, request_stream.size)
+			raise
+		endpoint = self.metrics.record(request.method, request.url.path, response.status_code, time.perf_counter() - started_at, request_stream.size)
+		response.stream = CountingStream(response.stream, lambda size: self.metrics.record_received(endpoint, size))
+		return response
+
+	def close(self):
+		self.transport.close()
+
+class AsyncInstrumentedTransport(httpx.AsyncBaseTransport):
+	def __init__(self, transport, metrics):
+		self.transport = transport
+		self.metrics = metrics
+
+	async def handle_async_request(self, request):
+		request.stream = request_stream = AsyncCountingStream(request.stream)
+		started_at = time.perf_counter()
+		try:
+			response = await self.transport.handle_async_request(request)
+		except Exception as error:
+			self.metrics.record(request.method, request.url.path, type(error).__name__, time.perf_counter() - started_at, request_stream.size)
+			raise
+		endpoint = self.metrics.record(request.method, request.url.path, response.status_code, time.perf_counter() - started_at, request_stream.size)
+		response.stream = AsyncCountingStream(response.stream, lambda size: self.metrics.record_received(endpoint, size))
+		return response
+
+	async def aclose(self):
+		await self.transport.aclose()
+
+class IMetricsExporter(ABC):
+	@abstractmethod
+	def export(self, metrics):
+		pass
+
+class JsonLinesMetricsExporter(IMetricsExporter):
+	def __init__(self, path):
+		self.path = path
+
+	def export(self, metrics):
+		os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+		with open(self.path, 'a') as metrics_file:
+			metrics_file.write(json.dumps({'timestamp': time.time(), 'endpoints': metrics.snapshot()}) + '\n')
+
+class ConsoleMetricsExporter(IMetricsExporter):
+	def __init__(self, console_manager):
+		self.console_manager = console_manager
+
+	@staticmethod
+	def quantile(buckets, entry, fraction):
+		# Upper bound of the bucket holding the quantile, as Prometheus would estimate it
+		target = entry['requests'] * fraction
+		cumulative = 0
+		for bound, count in zip(buckets, entry['buckets']):
+			cumulative += count
+			if cumulative >= target:
+				return f'{bound}s'
+		return f'>{buckets[-1]}s'
+
+	def export(self, metrics):
+		table = Table(show_header=True, header_style="bold magenta", box=box.SIMPLE)
+		for column in ("Endpoint", "Requests", "Error rate", "Retries", "p50", "p95", "Sent", "Received"):
+			table.add_column(column, style="cyan" if column == "Endpoint" else None, no_wrap=column == "Endpoint")
+		for endpoint, entry in sorted(metrics.snapshot().items()):
+			table.add_row(
+				endpoint,
+				str(entry['requests']),
+				f"{entry['errors'] / entry['requests']:.1%}",
+				str(entry['retries']),
+				self.quantile(metrics.buckets, entry, 0.5),
+				self.quantile(metrics.buckets, entry, 0.95),
+				f"{entry['bytes_sent'] / 1024:.1f} KiB",
+				f"{entry['bytes_received'] / 1024:.1f} KiB",
+			)
+		self.console_manager.console.print(table)
+
+class IMetricsReporter(ABC):
+	@abstractmethod
+	def start(self):
+		pass
+
+	@abstractmethod
+	def stop(self):
+		pass
+
+class MetricsReporter(IMetricsReporter):
+	def __init__(self, exporters, metrics=None, interval=60.0):
+		self.exporters = list(exporters)
+		self.metrics = MetricsRegistry.default() if metrics is None else metrics
+		self.interval = interval
+		self.stopped = threading.Event()
+		self.thread = None
+
+	def export(self):
+		for exporter in self.exporters:
+			exporter.export(self.metrics)
+
+	def report(self):
+		while not self.stopped.wait(self.interval):
+			self.export()
+
+	def start(self):
+		self.thread = threading.Thread(target=self.report, daemon=True)
+		self.thread.start()
+		return self
+
+	def stop(self):
+		# Whatever happened since the last tick is exported once more on the way out
+		self.stopped.set()
+		if self.thread is not None:
+			self.thread.join()
+		self.export()
+
+class PrometheusMetricsServer(IMetricsReporter):
+	def __init__(self, metrics=None, host='127.0.0.1', port=9464):
+		metrics = MetricsRegistry.default() if metrics is None else metrics
+
+		class MetricsHandler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				if self.path.split('?')[0] != '/metrics':
+					self.send_error(404)
+					return
+				body = metrics.render_prometheus().encode()
+				self.send_response(200)
+				self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, format, *args):
+				pass
+
+		self.metrics = metrics
+		self.httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+		self.httpd.daemon_threads = True
+		self.thread = None
+
+	@property
+	def url(self):
+		host, port = self.httpd.server_address[:2]
+		return f'http://{host}:{port}/metrics'
+
+	def start(self):
+		self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+		self.thread.start()
+		return self
+
+	def stop(self):
+		self.httpd.shutdown()
+		self.httpd.server_close()
+
+class IClientPool(ABC):
+	@abstractmethod
+	def client(self, operation='default'):
+		pass
+
+	@abstractmethod
+	def async_client(self, operation='default'):
+		pass
+
+class ClientPool(IClientPool):
+	# Uploads and downloads stream large bodies; polls should fail fast and be retried
+	TIMEOUTS = {
+		'default': httpx.Timeout(60.0, connect=5.0),
+		'upload': httpx.Timeout(600.0, connect=5.0),
+		'poll': httpx.Timeout(10.0, connect=5.0),
+	}
+	_defaults = {}
+	_defaults_lock = threading.Lock()
+
+	def __init__(self, max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0, http2=False, timeouts=None, rate_limit_scheduler=None, metrics=None, trust_env=True, **client_options):
+		self.limits = httpx.Limits(
+			max_connections=max_connections,
+			max_keepalive_connections=max_keepalive_connections,
+			keepalive_expiry=keepalive_expiry,
+		)
+		self.http2 = http2
+		self.trust_env = trust_env
+		self.timeouts = dict(self.TIMEOUTS, **(timeouts or {}))
+		self.rate_limit_scheduler = rate_limit_scheduler
+		self.metrics = MetricsRegistry.default() if metrics is None else metrics
+		self.client_options = client_options
+		self.lock = threading.Lock()
+		self.clients = {}
+		self.async_clients = {}
+		self.http = None
+		self.async_http = None
+
+	@classmethod
+	def default(cls, rate_limit_scheduler=None):
+		with cls._defaults_lock:
+			if rate_limit_scheduler not in cls._defaults:
+				cls._defaults[rate_limit_scheduler] = cls(rate_limit_scheduler=rate_limit_scheduler)
+			return cls._defaults[rate_limit_scheduler]
+
+	def proxy_mounts(self, transport_class, instrumented_class):
+		# httpx ignores HTTP(S)_PROXY and NO_PROXY once a transport is passed in, so the same mounts are built here
+		if not self.trust_env:
+			return {}
+		return {
+			pattern: None if url is None else instrumented_class(transport_class(proxy=httpx.Proxy(url), limits=self.limits, http2=self.http2), self.metrics)
+			for pattern, url in get_environment_proxies().items()
+		}
+
+	def transport_options(self, transport, mounts, event_hooks):
+		return {
+			'transport': transport,
+			'mounts': mounts,
+			'trust_env': self.trust_env,
+			'timeout': self.timeouts['default'],
+			'follow_redirects': True,
+			'event_hooks': event_hooks,
+		}
+
+	def client(self, operation='default'):
+		with self.lock:
+			if self.http is None:
+				event_hooks = self.rate_limit_scheduler.event_hooks() if self.rate_limit_scheduler else {}
+				transport = InstrumentedTransport(httpx.HTTPTransport(limits=self.limits, http2=self.http2), self.metrics)
+				mounts = self.proxy_mounts(httpx.HTTPTransport, InstrumentedTransport)
+				self.http = httpx.Client(**self.transport_options(transport, mounts, event_hooks))
+			if operation not in self.clients:
+				self.clients[operation] = OpenAI(http_client=self.http, timeout=self.timeouts[operation], **self.client_options)
+			return self.clients[operation]
+
+	def async_client(self, operation='default'):
+		with self.lock:
+			if self.async_http is None:
+				event_hooks = self.rate_limit_scheduler.async_event_hooks() if self.rate_limit_scheduler else {}
+				transport = AsyncInstrumentedTransport(httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2), self.metrics)
+				mounts = self.proxy_mounts(httpx.AsyncHTTPTransport, AsyncInstrumentedTransport)
+				self.async_http = httpx.AsyncClient(**self.transport_options(transport, mounts, event_hooks))
+			if operation not in self.async_clients:
+				self.async_clients[operation] = AsyncOpenAI(http_client=self.async_http, timeout=self.timeouts[operation], **self.client_options)
+			return self.async_clients[operation]
+
+	def close(self):
+		with self.lock:
+			if self.http is not None:
+				self.http.close()
+			self.http = None
+			self.clients = {}
+
+	async def aclose(self):
+		with self.lock:
+			async_http, self.async_http = self.async_http, None
+			self.async_clients = {}
+		if async_http is not None:
+			await async_http.aclose()
+
 class IOpenAIManager(ABC):
 	@abstractmethod
 	def __init__(self):
 		pass
 
 class OpenAIManager(IOpenAIManager):
-	def __init__(self):
-		self.client = OpenAI()
+	def __init__(self, rate_limit_scheduler=None, client_pool=None):
+		self.rate_limit_scheduler = rate_limit_scheduler
+		self.client_pool = ClientPool.default(rate_limit_scheduler) if client_pool is None else client_pool
+		self.metrics = self.client_pool.metrics
+		self.client = self.client_pool.client()
+		self.upload_client = self.client_pool.client('upload')
+		self.poll_client = self.client_pool.client('poll')
+
+class IAssistantCache(ABC):
+	@abstractmethod
+	def get(self, assistant_id):
+		pass
+
+	@abstractmethod
+	def store(self, assistant):
+		pass
+
+	@abstractmethod
+	def invalidate(self, assistant_id):
+		pass
+
+class AssistantCache(IAssistantCache):
+	_default = None
+
+	def __init__(self, ttl=300, path=None):
+		self.ttl = ttl
+		self.path = path
+		self.entries = {}
+		self.lock = threading.Lock()
+		if path is not None:
+			os.makedirs(path, exist_ok=True)
+
+	@classmethod
+	def default(cls):
+		if cls._default is None:
+			cls._default = cls()
+		return cls._default
+
+	def entry_path(self, assistant_id):
+		return os.path.join(self.path, f'{assistant_id}.json')
+
+	def load(self, assistant_id):
+		try:
+			with open(self.entry_path(assistant_id), 'r') as entry_file:
+				data = json.load(entry_file)
+		except (OSError, ValueError):
+			return None
+		entry = (data['fetched_at'], AssistantObject(**data['assistant']))
+		with self.lock:
+			self.entries[assistant_id] = entry
+		return entry
+
+	def get(self, assistant_id):
+		with self.lock:
+			entry = self.entries.get(assistant_id)
+		if self.path is not None:
+			# A newer file on disk means another process fetched or updated the assistant since
+			try:
+				modified_at = os.stat(self.entry_path(assistant_id)).st_mtime
+			except OSError:
+				modified_at = None
+			if modified_at is not None and (entry is None or modified_at > entry[0]):
+				entry = self.load(assistant_id)
+		if entry is None or time.time() - entry[0] > self.ttl:
+			return None
+		return entry[1]
+
+	def store(self, assistant):
+		fetched_at = time.time()
+		with self.lock:
+			self.entries[assistant.id] = (fetched_at, assistant)
+		if self.path is not None:
+			entry_path = self.entry_path(assistant.id)
+			tmp_path = f'{entry_path}.tmp'
+			with open(tmp_path, 'w') as entry_file:
+				json.dump({'fetched_at': fetched_at, 'assistant': assistant.model_dump()}, entry_file)
+			os.utime(tmp_path, (fetched_at, fetched_at))
+			os.replace(tmp_path, entry_path)
+
+	def invalidate(self, assistant_id):
+		with self.lock:
+			self.entries.pop(assistant_id, None)
+		if self.path is not None:
+			try:
+				os.remove(self.entry_path(assistant_id))
+			except FileNotFoundError:
+				pass
 
 class IAssistant(ABC):
 	@abstractmethod
@@ -88,17 +727,97 @@ class IAssistant(ABC):
 		pass
 
 class Assistant(IAssistant):
-	def __init__(self, client, assistant_id):
+	def __init__(self, client, assistant_id, assistant_cache=None):
 		self.client = client
 		self.assistant_id = assistant_id
+		self.assistant_cache = AssistantCache.default() if assistant_cache is None else assistant_cache
 		self.assistant = self.retrieve_assistant()
 
-	def retrieve_assistant(self):
-		assistant = self.client.beta.assistants.retrieve(self.assistant_id)
+	def retrieve_assistant(self, refresh=False):
+		assistant = None if refresh else self.assistant_cache.get(self.assistant_id)
+		if assistant is None:
+			assistant = self.client.beta.assistants.retrieve(self.assistant_id)
+			self.assistant_cache.store(assistant)
 		return {_: my_assistant for _, my_assistant in assistant}
 
 	def update_assistant(self, file_ids):
-		return self.client.beta.assistants.update(self.assistant["id"], file_ids=file_ids)
+		# Drop the cached copy first so a failed update can't leave stale metadata behind
+		self.assistant_cache.invalidate(self.assistant_id)
+		assistant = self.client.beta.assistants.update(self.assistant["id"], file_ids=file_ids)
+		self.assistant_cache.store(assistant)
+		self.assistant = {_: my_assistant for _, my_assistant in assistant}
+		return assistant
+
+def content_digest(file_path):
+	# Archives written by zip_directory already carry their digest in the manifest
+	if ZipManifest.exists(file_path):
+		return ZipManifest(file_path).archive_digest()
+	return file_digest(file_path)
+
+class IFileCache(ABC):
+	@abstractmethod
+	def lookup(self, client, digest, purpose):
+		pass
+
+	@abstractmethod
+	def store(self, digest, purpose, file_id):
+		pass
+
+	@abstractmethod
+	def evict(self, digest, purpose):
+		pass
+
+class FileCache(IFileCache):
+	DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'oai_assistant_bot', 'files.sqlite3')
+	_default = None
+
+	def __init__(self, path=DEFAULT_PATH):
+		self.path = path
+		if path != ':memory:':
+			os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+		self.lock = threading.Lock()
+		self.connection = sqlite3.connect(path, check_same_thread=False)
+		with self.lock, self.connection:
+			self.connection.execute(
+				'CREATE TABLE IF NOT EXISTS files ('
+				'digest TEXT NOT NULL, purpose TEXT NOT NULL, file_id TEXT NOT NULL, created_at REAL NOT NULL, '
+				'PRIMARY KEY (digest, purpose))'
+			)
+
+	@classmethod
+	def default(cls):
+		if cls._default is None:
+			cls._default = cls()
+		return cls._default
+
+	def get(self, digest, purpose):
+		with self.lock:
+			row = self.connection.execute('SELECT file_id FROM files WHERE digest = ? AND purpose = ?', (digest, purpose)).fetchone()
+		return row[0] if row else None
+
+	def lookup(self, client, digest, purpose):
+		file_id = self.get(digest, purpose)
+		if file_id is None:
+			return None
+		try:
+			file_object = client.files.retrieve(file_id)
+		except NotFoundError:
+			file_object = None
+		if file_object is None or file_object.status == 'error':
+			self.evict(digest, purpose)
+			return None
+		return file_object
+
+	def store(self, digest, purpose, file_id):
+		with self.lock, self.connection:
+			self.connection.execute(
+				'INSERT OR REPLACE INTO files (digest, purpose, file_id, created_at) VALUES (?, ?, ?, ?)',
+				(digest, purpose, file_id, time.time()),
+			)
+
+	def evict(self, digest, purpose):
+		with self.lock, self.connection:
+			self.connection.execute('DELETE FROM files WHERE digest = ? AND purpose = ?', (digest, purpose))
 
 class IFile(ABC):
 	@abstractmethod
@@ -110,15 +829,259 @@ class IFile(ABC):
 		pass
 
 class File(IFile):
-	def __init__(self, client, filepath, purpose):
+	def __init__(self, client, filepath, purpose, file_cache=None):
 		self.client = client
 		self.filepath = filepath
 		self.purpose = purpose
+		self.file_cache = FileCache.default() if file_cache is None else file_cache
 		self.file_object = self.create_file()
 
 	def create_file(self):
+		digest = content_digest(self.filepath)
+		file_object = self.file_cache.lookup(self.client, digest, self.purpose)
+		if file_object is not None:
+			return file_object
+
 		with open(self.filepath, 'rb') as file:
-			return self.client.files.create(file=file, purpose=self.purpose)
+			file_object = self.client.files.create(file=file, purpose=self.purpose)
+
+		self.file_cache.store(digest, self.purpose, file_object.id)
+		return file_object
+
+class ChunkedFile(IFile):
+	PART_SIZE = 64 * 1024 * 1024
+
+	def __init__(self, client, filepath, purpose, part_size=PART_SIZE, mime_type='application/zip', file_cache=None):
+		self.client = client
+		self.filepath = filepath
+		self.purpose = purpose
+		self.file_cache = FileCache.default() if file_cache is None else file_cache
+		self.part_size = part_size
+		self.mime_type = mime_type
+		self.state_path = f'{filepath}.upload.json'
+		self.file_object = self.create_file()
+
+	def load_state(self):
+		try:
+			with open(self.state_path, 'r') as state_file:
+				state = json.load(state_file)
+		except (OSError, ValueError):
+			return None
+		stat = os.stat(self.filepath)
+		# Parts recorded against another version of the file are useless
+		if (state.get('size'), state.get('mtime_ns'), state.get('purpose'), state.get('part_size')) != (stat.st_size, stat.st_mtime_ns, self.purpose, self.part_size):
+			return None
+		return state
+
+	def save_state(self, state):
+		tmp_path = f'{self.state_path}.tmp'
+		with open(tmp_path, 'w') as state_file:
+			json.dump(state, state_file)
+		os.replace(tmp_path, self.state_path)
+
+	def start_upload(self):
+		stat = os.stat(self.filepath)
+		upload = self.client.post(
+			'/uploads',
+			cast_to=object,
+			body={
+				'filename': os.path.basename(self.filepath),
+				'purpose': self.purpose,
+				'bytes': stat.st_size,
+				'mime_type': self.mime_type,
+			},
+		)
+		state = {
+			'upload_id': upload['id'],
+			'size': stat.st_size,
+			'mtime_ns': stat.st_mtime_ns,
+			'purpose': self.purpose,
+			'part_size': self.part_size,
+			'part_ids': {},
+		}
+		self.save_state(state)
+		return state
+
+	def upload_parts(self, state):
+		part_count = max(1, -(-state['size'] // self.part_size))
+		with open(self.filepath, 'rb') as file:
+			for index in range(part_count):
+				if str(index) in state['part_ids']:
+					continue
+				file.seek(index * self.part_size)
+				part = self.client.post(
+					f"/uploads/{state['upload_id']}/parts",
+					cast_to=object,
+					body={},
+					files=[('data', (f'part-{index}', file.read(self.part_size)))],
+					options={'headers': {'Content-Type': 'multipart/form-data'}},
+				)
+				state['part_ids'][str(index)] = part['id']
+				self.save_state(state)
+		return [state['part_ids'][str(index)] for index in range(part_count)]
+
+	def create_file(self):
+		digest = content_digest(self.filepath)
+		file_object = self.file_cache.lookup(self.client, digest, self.purpose)
+		if file_object is not None:
+			return file_object
+
+		state = self.load_state() or self.start_upload()
+		try:
+			part_ids = self.upload_parts(state)
+		except NotFoundError:
+			# The upload expired or was cancelled on the server, so start over
+			state = self.start_upload()
+			part_ids = self.upload_parts(state)
+
+		upload = self.client.post(f"/uploads/{state['upload_id']}/complete", cast_to=object, body={'part_ids': part_ids})
+		os.remove(self.state_path)
+		file_object = FileObject(**upload['file'])
+		self.file_cache.store(digest, self.purpose, file_object.id)
+		return file_object
+
+class IFileBatch(ABC):
+	@abstractmethod
+	def __init__(self, client, filepaths, purpose):
+		pass
+
+	@abstractmethod
+	def create_files(self):
+		pass
+
+class FileBatch(IFileBatch):
+	TRANSIENT_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+	def __init__(self, client, filepaths, purpose, max_concurrency=8, max_attempts=4, backoff=1.0, file_cache=None):
+		self.client = client
+		self.filepaths = list(filepaths)
+		self.purpose = purpose
+		self.file_cache = file_cache
+		self.max_concurrency = max_concurrency
+		self.max_attempts = max_attempts
+		self.backoff = backoff
+		# Retries happen here, so the SDK must not multiply them with its own
+		self.upload_client = client.with_options(max_retries=0)
+		self.file_objects = self.create_files()
+		self.file_ids = [file_object.id for file_object in self.file_objects]
+
+	def create_file(self, filepath):
+		for attempt in range(self.max_attempts):
+			try:
+				return File(self.upload_client, filepath, self.purpose, self.file_cache).file_object
+			except self.TRANSIENT_ERRORS:
+				if attempt + 1 == self.max_attempts:
+					raise
+				time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+	def create_files(self):
+		# map keeps the results in input order whatever order the uploads finish in
+		with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+			return list(executor.map(self.create_file, self.filepaths))
+
+class IBoundedPipe(ABC):
+	@abstractmethod
+	def write(self, data):
+		pass
+
+	@abstractmethod
+	def read(self, size=-1):
+		pass
+
+	@abstractmethod
+	def close(self, error=None):
+		pass
+
+class BoundedPipe(IBoundedPipe):
+	def __init__(self, max_chunks=64, chunk_size=1 << 16):
+		self.chunks = queue.Queue(maxsize=max_chunks)
+		self.chunk_size = chunk_size
+		self.pending = bytearray()
+		self.buffer = bytearray()
+		self.error = None
+		self.closed = False
+		self.aborted = False
+		self.eof = False
+
+	def put(self, chunk):
+		# Block while the reader is behind, but give up once it has gone away
+		while True:
+			try:
+				self.chunks.put(chunk, timeout=0.1)
+				return
+			except queue.Full:
+				if self.aborted:
+					raise BrokenPipeError('reader closed the pipe')
+
+	def write(self, data):
+		self.pending += data
+		while len(self.pending) >= self.chunk_size:
+			self.put(bytes(self.pending[:self.chunk_size]))
+			del self.pending[:self.chunk_size]
+		return len(data)
+
+	def flush(self):
+		pass
+
+	def close(self, error=None):
+		if self.closed:
+			return
+		self.closed = True
+		self.error = error
+		if self.pending and error is None:
+			self.put(bytes(self.pending))
+		self.pending = bytearray()
+		self.put(None)
+
+	def abort(self):
+		self.aborted = True
+
+	def read(self, size=-1):
+		while not self.eof and (size < 0 or len(self.buffer) < size):
+			chunk = self.chunks.get()
+			if chunk is None:
+				self.eof = True
+				if self.error is not None:
+					raise OSError('archive producer failed') from self.error
+				break
+			self.buffer += chunk
+		if size < 0 or size >= len(self.buffer):
+			data, self.buffer = bytes(self.buffer), bytearray()
+		else:
+			data = bytes(self.buffer[:size])
+			del self.buffer[:size]
+		return data
+
+class DirectoryFile(IFile):
+	def __init__(self, client, directory_path, file_name, purpose, max_chunks=64, workers=None, compress_level=zlib.Z_DEFAULT_COMPRESSION, ignore_rules=None):
+		self.client = client
+		self.directory_path = directory_path
+		self.file_name = file_name
+		self.purpose = purpose
+		self.max_chunks = max_chunks
+		self.workers = workers
+		self.compress_level = compress_level
+		self.ignore_rules = ignore_rules
+		self.file_object = self.create_file()
+
+	def create_file(self):
+		pipe = BoundedPipe(self.max_chunks)
+		producer = threading.Thread(
+			target=DirectoryManager.stream_directory,
+			args=(self.directory_path, pipe, self.workers, self.compress_level, self.ignore_rules),
+			daemon=True,
+		)
+		producer.start()
+		try:
+			# The pipe cannot be rewound, so the SDK must not retry the request by itself
+			file_object = self.client.with_options(max_retries=0).files.create(file=(self.file_name, pipe), purpose=self.purpose)
+		finally:
+			pipe.abort()
+			producer.join()
+			# The upload only sees a broken body; the producer's error says what actually went wrong
+			if pipe.error is not None:
+				raise pipe.error
+		return file_object
 
 class IThread(ABC):
 	@abstractmethod
@@ -173,6 +1136,425 @@ class Message(IMessage):
 			thread_id=self.thread_id,
 		)
 
+class IRunSubmitter(ABC):
+	@abstractmethod
+	def __init__(self, client):
+		pass
+
+	@abstractmethod
+	def submit(self, assistant_id, messages, thread_id=None, **run_options):
+		pass
+
+class RunSubmitter(IRunSubmitter):
+	def __init__(self, client):
+		self.client = client
+
+	@staticmethod
+	def thread_messages(messages):
+		thread_messages = []
+		for message in messages:
+			if isinstance(message, str):
+				message = {'role': 'user', 'content': message}
+			thread_messages.append(dict(message))
+		return thread_messages
+
+	def submit(self, assistant_id, messages, thread_id=None, **run_options):
+		messages = self.thread_messages(messages)
+		if thread_id is None:
+			# A new thread, its messages and the run all go out in a single request
+			return self.client.beta.threads.create_and_run(assistant_id=assistant_id, thread={'messages': messages}, **run_options)
+
+		# An existing thread needs one call per message; they reuse the client's warm connection
+		for message in messages:
+			self.client.beta.threads.messages.create(thread_id=thread_id, **message)
+		return self.client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id, **run_options)
+
+class ILazyHandle(ABC):
+	@abstractmethod
+	def __init__(self, client, resource_id):
+		pass
+
+	@abstractmethod
+	def retrieve(self):
+		pass
+
+class LazyHandle(ILazyHandle):
+	def __init__(self, client, resource_id):
+		self.client = client
+		self.id = resource_id
+		self._object = None
+		self._lock = threading.Lock()
+
+	@property
+	def materialized(self):
+		return self._object is not None
+
+	def materialize(self):
+		with self._lock:
+			if self._object is None:
+				self._object = self.retrieve()
+		return self._object
+
+	def __getattr__(self, name):
+		# Only reached for attributes the handle doesn't carry itself, i.e. the remote fields
+		if name.startswith('_'):
+			raise AttributeError(name)
+		return getattr(self.materialize(), name)
+
+	@staticmethod
+	def materialize_all(handles, max_concurrency=8):
+		pending = [handle for handle in handles if not handle.materialized]
+		with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+			list(executor.map(lambda handle: handle.materialize(), pending))
+		return handles
+
+class AssistantHandle(LazyHandle):
+	def __init__(self, client, assistant_id, assistant_cache=None):
+		super().__init__(client, assistant_id)
+		self.assistant_cache = AssistantCache.default() if assistant_cache is None else assistant_cache
+
+	def retrieve(self):
+		assistant = self.assistant_cache.get(self.id)
+		if assistant is None:
+			assistant = self.client.beta.assistants.retrieve(self.id)
+			self.assistant_cache.store(assistant)
+		return assistant
+
+	@property
+	def assistant(self):
+		return {_: my_assistant for _, my_assistant in self.materialize()}
+
+class FileHandle(LazyHandle):
+	def retrieve(self):
+		return self.client.files.retrieve(self.id)
+
+	@property
+	def file_object(self):
+		return self
+
+class ThreadHandle(LazyHandle):
+	def retrieve(self):
+		return self.client.beta.threads.retrieve(self.id)
+
+	@property
+	def thread(self):
+		return self
+
+class MessageHandle(LazyHandle):
+	def __init__(self, client, thread_id, message_id):
+		super().__init__(client, message_id)
+		self.thread_id = thread_id
+
+	def retrieve(self):
+		return self.client.beta.threads.messages.retrieve(message_id=self.id, thread_id=self.thread_id)
+
+	@property
+	def thread_message(self):
+		return self
+
+class ITranscriptStore(ABC):
+	@abstractmethod
+	def append(self, thread_id, messages):
+		pass
+
+	@abstractmethod
+	def thread_messages(self, thread_id, role=None, since=None, until=None):
+		pass
+
+	@abstractmethod
+	def search(self, query, thread_id=None, limit=50):
+		pass
+
+class TranscriptStore(ITranscriptStore):
+	DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'oai_assistant_bot', 'transcripts')
+	SEGMENT_SIZE = 64 * 1024 * 1024
+
+	def __init__(self, path=DEFAULT_PATH, segment_size=SEGMENT_SIZE):
+		self.path = path
+		self.segment_size = segment_size
+		os.makedirs(path, exist_ok=True)
+		self.lock = threading.Lock()
+		self.connection = sqlite3.connect(os.path.join(path, 'index.sqlite3'), check_same_thread=False)
+		with self.lock, self.connection:
+			self.connection.execute(
+				'CREATE TABLE IF NOT EXISTS messages ('
+				'rowid INTEGER PRIMARY KEY, message_id TEXT NOT NULL UNIQUE, thread_id TEXT NOT NULL, role TEXT NOT NULL, '
+				'created_at INTEGER NOT NULL, segment TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL)'
+			)
+			self.connection.execute('CREATE INDEX IF NOT EXISTS messages_thread ON messages (thread_id, created_at)')
+			self.connection.execute('CREATE INDEX IF NOT EXISTS messages_role ON messages (role, created_at)')
+			self.connection.execute('CREATE VIRTUAL TABLE IF NOT EXISTS message_text USING fts5 (text)')
+		segments = sorted(name for name in os.listdir(path) if name.startswith('segment-'))
+		self.segment = segments[-1] if segments else 'segment-000000.jsonl'
+
+	@staticmethod
+	def record(thread_id, message):
+		text = [content.text.value for content in message.content if getattr(content, 'text', None) is not None]
+		return {
+			'id': message.id,
+			'thread_id': thread_id,
+			'role': message.role,
+			'created_at': message.created_at,
+			'assistant_id': getattr(message, 'assistant_id', None),
+			'run_id': getattr(message, 'run_id', None),
+			'file_ids': list(getattr(message, 'file_ids', None) or []),
+			'text': '\n'.join(text),
+		}
+
+	def next_segment(self):
+		# Segments are only ever appended to; once one is full a new one is started
+		segment_path = os.path.join(self.path, self.segment)
+		if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.segment_size:
+			number = int(self.segment[len('segment-'):-len('.jsonl')]) + 1
+			self.segment = f'segment-{number:06d}.jsonl'
+		return self.segment
+
+	def write_records(self, records):
+		entries = []
+		pending = list(records)
+		while pending:
+			segment = self.next_segment()
+			with open(os.path.join(self.path, segment), 'ab') as segment_file:
+				while pending and segment_file.tell() < self.segment_size:
+					record = pending.pop(0)
+					line = (json.dumps(record) + '\n').encode('utf-8')
+					entries.append((record, segment, segment_file.tell(), len(line)))
+					segment_file.write(line)
+				segment_file.flush()
+				os.fsync(segment_file.fileno())
+		return entries
+
+	def append(self, thread_id, messages):
+		with self.lock:
+			known = set()
+			ids = [message.id for message in messages]
+			for start in range(0, len(ids), 500):
+				batch = ids[start:start + 500]
+				rows = self.connection.execute(
+					f"SELECT message_id FROM messages WHERE message_id IN ({','.join('?' * len(batch))})", batch
+				).fetchall()
+				known.update(row[0] for row in rows)
+			records = [self.record(thread_id, message) for message in messages if message.id not in known]
+			if not records:
+				return 0
+
+			entries = self.write_records(records)
+			with self.connection:
+				for record, segment, offset, length in entries:
+					cursor = self.connection.execute(
+						'INSERT INTO messages (message_id, thread_id, role, created_at, segment, offset, length) VALUES (?, ?, ?, ?, ?, ?, ?)',
+						(record['id'], thread_id, record['role'], record['created_at'], segment, offset, length),
+					)
+					self.connection.execute('INSERT INTO message_text (rowid, text) VALUES (?, ?)', (cursor.lastrowid, record['text']))
+			return len(records)
+
+	def read(self, rows):
+		records = []
+		for segment, offset, length in rows:
+			with open(os.path.join(self.path, segment), 'rb') as segment_file:
+				segment_file.seek(offset)
+				records.append(json.loads(segment_file.read(length)))
+		return records
+
+	def message(self, message_id):
+		with self.lock:
+			rows = self.connection.execute('SELECT segment, offset, length FROM messages WHERE message_id = ?', (message_id,)).fetchall()
+		records = self.read(rows)
+		return records[0] if records else None
+
+	def thread_messages(self, thread_id, role=None, since=None, until=None):
+		query = 'SELECT segment, offset, length FROM messages WHERE thread_id = ?'
+		parameters = [thread_id]
+		if role is not None:
+			query += ' AND role = ?'
+			parameters.append(role)
+		if since is not None:
+			query += ' AND created_at >= ?'
+			parameters.append(since)
+		if until is not None:
+			query += ' AND created_at < ?'
+			parameters.append(until)
+		with self.lock:
+			rows = self.connection.execute(query + ' ORDER BY created_at, rowid', parameters).fetchall()
+		return self.read(rows)
+
+	def search(self, query, thread_id=None, limit=50):
+		sql = (
+			'SELECT messages.segment, messages.offset, messages.length FROM message_text '
+			'JOIN messages ON messages.rowid = message_text.rowid WHERE message_text MATCH ?'
+		)
+		# Each word is matched as a quoted string, so ids like file-abc and words like AND or can't are searched for literally
+		terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+		if not terms:
+			return []
+		parameters = [' '.join(terms)]
+		if thread_id is not None:
+			sql += ' AND messages.thread_id = ?'
+			parameters.append(thread_id)
+		with self.lock:
+			rows = self.connection.execute(sql + ' ORDER BY rank LIMIT ?', parameters + [limit]).fetchall()
+		return self.read(rows)
+
+class IMessageSync(ABC):
+	@abstractmethod
+	def __init__(self, client):
+		pass
+
+	@abstractmethod
+	def new_messages(self, thread_id):
+		pass
+
+	@abstractmethod
+	def commit(self, thread_id, message_id=None):
+		pass
+
+class MessageSync(IMessageSync):
+	DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'oai_assistant_bot', 'message_cursors.json')
+
+	def __init__(self, client, cursor_path=DEFAULT_PATH, transcript_store=None):
+		self.client = client
+		self.cursor_path = cursor_path
+		self.transcript_store = transcript_store
+		self.cursors = {}
+		self.pending = {}
+		self.load()
+
+	def load(self):
+		try:
+			with open(self.cursor_path, 'r') as cursor_file:
+				self.cursors = json.load(cursor_file)
+		except (OSError, ValueError):
+			self.cursors = {}
+
+	def save(self):
+		os.makedirs(os.path.dirname(os.path.abspath(self.cursor_path)), exist_ok=True)
+		tmp_path = f'{self.cursor_path}.tmp'
+		with open(tmp_path, 'w') as cursor_file:
+			json.dump(self.cursors, cursor_file)
+		os.replace(tmp_path, self.cursor_path)
+
+	def new_messages(self, thread_id):
+		options = {'order': 'asc'}
+		if thread_id in self.cursors:
+			options['after'] = self.cursors[thread_id]
+		messages = []
+		for message in self.client.beta.threads.messages.list(thread_id, **options):
+			# A message still being written must be fetched again on the next sync
+			if getattr(message, 'status', None) == 'in_progress':
+				break
+			messages.append(message)
+		self.pending[thread_id] = messages
+		return messages
+
+	def commit(self, thread_id, message_id=None):
+		# The cursor only moves past messages the caller has finished with,
+		# so a refresh that failed halfway sees the rest of them again
+		messages = self.pending.get(thread_id, [])
+		message_ids = [message.id for message in messages]
+		if message_id is None:
+			committed = messages
+		elif message_id in message_ids:
+			committed = messages[:message_ids.index(message_id) + 1]
+		else:
+			committed = []
+		if not committed:
+			return
+
+		if self.transcript_store is not None:
+			self.transcript_store.append(thread_id, committed)
+		self.cursors[thread_id] = committed[-1].id
+		self.pending[thread_id] = messages[len(committed):]
+		self.save()
+
+class RunStreamRenderer(AssistantEventHandler):
+	def __init__(self, console_manager, refresh_per_second=12):
+		super().__init__()
+		self.console_manager = console_manager
+		self.run_status = 'queued'
+		self.message_text = Text()
+		self.tool_calls = {}
+		self.tool_call_status = {}
+		self.live = Live(self.render(), console=console_manager.console, refresh_per_second=refresh_per_second)
+
+	@staticmethod
+	def tool_call_progress(tool_call):
+		if tool_call.type == 'code_interpreter':
+			lines = (tool_call.code_interpreter.input or '').strip().splitlines()
+			outputs = len(tool_call.code_interpreter.outputs or [])
+			return f"{lines[-1] if lines else ''}  [{outputs} output(s)]"
+		if tool_call.type == 'function':
+			return f"{tool_call.function.name}({tool_call.function.arguments or ''})"
+		return ''
+
+	def render(self):
+		table = Table(show_header=True, header_style="bold magenta", box=box.SIMPLE)
+		table.add_column("Tool", style="cyan")
+		table.add_column("Status", style="green")
+		table.add_column("Progress", style="dim", overflow="ellipsis", no_wrap=True)
+		for tool_call_id, tool_call in self.tool_calls.items():
+			table.add_row(tool_call.type, self.tool_call_status[tool_call_id], self.tool_call_progress(tool_call))
+		return Group(
+			Text(f"Run: {self.run_status}", style="bold blue"),
+			Panel(self.message_text, title="Assistant", border_style="green"),
+			table,
+		)
+
+	def refresh(self):
+		self.live.update(self.render())
+
+	def on_event(self, event):
+		if event.event.startswith('thread.run.') and not event.event.startswith('thread.run.step.'):
+			self.run_status = event.data.status
+			self.refresh()
+
+	def on_text_created(self, text):
+		if self.message_text:
+			self.message_text.append('\n\n')
+
+	def on_text_delta(self, delta, snapshot):
+		self.message_text.append(delta.value or '')
+		self.refresh()
+
+	def on_tool_call_created(self, tool_call):
+		self.tool_calls[tool_call.id] = tool_call
+		self.tool_call_status[tool_call.id] = 'running'
+		self.refresh()
+
+	def on_tool_call_delta(self, delta, snapshot):
+		self.tool_calls[snapshot.id] = snapshot
+		self.refresh()
+
+	def on_tool_call_done(self, tool_call):
+		self.tool_calls[tool_call.id] = tool_call
+		self.tool_call_status[tool_call.id] = 'done'
+		self.refresh()
+
+class IRunStreamer(ABC):
+	@abstractmethod
+	def __init__(self, client, console_manager):
+		pass
+
+	@abstractmethod
+	def stream(self, thread_id, assistant_id, **run_options):
+		pass
+
+class RunStreamer(IRunStreamer):
+	def __init__(self, client, console_manager):
+		self.client = client
+		self.console_manager = console_manager
+
+	def stream(self, thread_id, assistant_id, **run_options):
+		renderer = RunStreamRenderer(self.console_manager)
+		with renderer.live:
+			with self.client.beta.threads.runs.create_and_stream(
+				thread_id=thread_id,
+				assistant_id=assistant_id,
+				event_handler=renderer,
+				**run_options,
+			) as stream:
+				stream.until_done()
+		return renderer.current_run
+
 class IRunStepDetailsPrinter(ABC):
 	@abstractmethod
 	def __init__(self, console_manager):
@@ -208,6 +1590,567 @@ class RunStepDetailsPrinter(IRunStepDetailsPrinter):
 					except AttributeError:
 						pass
 
+def run_state(run):
+	# A run can ask for tool outputs twice in a row, so the pending calls are part of its state
+	required_action = getattr(run, 'required_action', None)
+	if run.status == 'requires_action' and required_action is not None:
+		return run.status, tuple(tool_call.id for tool_call in required_action.submit_tool_outputs.tool_calls)
+	return run.status, ()
+
+class IToolRegistry(ABC):
+	@abstractmethod
+	def register(self, name=None, timeout=None):
+		pass
+
+	@abstractmethod
+	def get(self, name):
+		pass
+
+class ToolRegistry(IToolRegistry):
+	def __init__(self, default_timeout=30.0):
+		self.default_timeout = default_timeout
+		self.tools = {}
+
+	def register(self, name=None, timeout=None):
+		def decorator(function):
+			self.tools[name or function.__name__] = (function, self.default_timeout if timeout is None else timeout)
+			return function
+		return decorator
+
+	def get(self, name):
+		return self.tools.get(name)
+
+class IToolExecutor(ABC):
+	@abstractmethod
+	def __init__(self, client, registry):
+		pass
+
+	@abstractmethod
+	def handle(self, run):
+		pass
+
+class ToolExecutor(IToolExecutor):
+	def __init__(self, client, registry, max_workers=8):
+		self.client = client
+		self.registry = registry
+		self.max_workers = max_workers
+
+	@staticmethod
+	def call(function, arguments):
+		result = function(**json.loads(arguments or '{}'))
+		return result if isinstance(result, str) else json.dumps(result)
+
+	def start(self, index, function, arguments, finished):
+		# A thread per call: one that hangs past its timeout is abandoned instead of holding a worker later calls need
+		def run():
+			try:
+				finished.put((index, self.call(function, arguments), None))
+			except Exception as error:
+				finished.put((index, None, error))
+		threading.Thread(target=run, daemon=True).start()
+
+	def execute(self, tool_calls):
+		outputs = [None] * len(tool_calls)
+		waiting = deque()
+		for index, tool_call in enumerate(tool_calls):
+			tool = self.registry.get(tool_call.function.name)
+			if tool is None:
+				outputs[index] = json.dumps({'error': f'Unknown tool: {tool_call.function.name}'})
+			else:
+				waiting.append((index, tool_call, *tool))
+
+		# Each call's deadline starts when it starts running, and one that times out frees its slot for the next
+		finished = queue.Queue()
+		running = {}
+		while waiting or running:
+			while waiting and len(running) < self.max_workers:
+				index, tool_call, function, timeout = waiting.popleft()
+				running[index] = (tool_call, timeout, time.monotonic() + timeout)
+				self.start(index, function, tool_call.function.arguments, finished)
+
+			index, (tool_call, timeout, deadline) = min(running.items(), key=lambda item: item[1][2])
+			try:
+				index, result, error = finished.get(timeout=max(0, deadline - time.monotonic()))
+			except queue.Empty:
+				del running[index]
+				outputs[index] = json.dumps({'error': f'{tool_call.function.name} timed out after {timeout}s'})
+				continue
+			if index not in running:
+				# Late result of a call that already timed out
+				continue
+			del running[index]
+			outputs[index] = result if error is None else json.dumps({'error': f'{type(error).__name__}: {error}'})
+		return [{'tool_call_id': tool_call.id, 'output': output} for tool_call, output in zip(tool_calls, outputs)]
+
+	def handle(self, run):
+		if run.status != 'requires_action' or run.required_action is None:
+			return None
+		tool_outputs = self.execute(run.required_action.submit_tool_outputs.tool_calls)
+		# All outputs of the step go back in a single request
+		return self.client.beta.threads.runs.submit_tool_outputs(
+			thread_id=run.thread_id,
+			run_id=run.id,
+			tool_outputs=tool_outputs,
+		)
+
+	def listener(self, run, previous_status):
+		self.handle(run)
+
+class IRunWatcher(ABC):
+	@abstractmethod
+	def __init__(self, client, thread_id, run_id):
+		pass
+
+	@abstractmethod
+	def add_listener(self, callback):
+		pass
+
+	@abstractmethod
+	def watch(self):
+		pass
+
+class RunWatcher(IRunWatcher):
+	TERMINAL_STATUSES = ('completed', 'failed', 'cancelled', 'expired')
+
+	def __init__(self, client, thread_id, run_id, min_interval=0.25, max_interval=5.0, backoff=1.5, jitter=0.2):
+		self.client = client
+		self.thread_id = thread_id
+		self.run_id = run_id
+		self.min_interval = min_interval
+		self.max_interval = max_interval
+		self.backoff = backoff
+		self.jitter = jitter
+		self.listeners = []
+		self.run = None
+
+	def add_listener(self, callback):
+		self.listeners.append(callback)
+		return callback
+
+	def poll(self):
+		return self.client.beta.threads.runs.retrieve(thread_id=self.thread_id, run_id=self.run_id)
+
+	def watch(self):
+		# Poll fast right after a transition and back off while the status stays put,
+		# which keeps long tool steps cheap without delaying the next transition much
+		interval = self.min_interval
+		previous_status = None
+		previous_state = None
+		while True:
+			self.run = self.poll()
+			if run_state(self.run) != previous_state:
+				for listener in self.listeners:
+					listener(self.run, previous_status)
+				interval = self.min_interval
+			else:
+				interval = min(interval * self.backoff, self.max_interval)
+			previous_status = self.run.status
+			previous_state = run_state(self.run)
+			if self.run.status in self.TERMINAL_STATUSES:
+				return self.run
+			time.sleep(interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+class IRunScheduler(ABC):
+	@abstractmethod
+	def __init__(self, client):
+		pass
+
+	@abstractmethod
+	async def watch(self, thread_id, run_id, listener=None):
+		pass
+
+class RunScheduler(IRunScheduler):
+	TERMINAL_STATUSES = RunWatcher.TERMINAL_STATUSES
+	STATUS_PRIORITY = {'requires_action': 0, 'cancelling': 1, 'in_progress': 2, 'queued': 3}
+	TRANSIENT_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+	def __init__(self, client, polls_per_second=20.0, max_in_flight=32, min_interval=0.5, max_interval=10.0, backoff=1.5, jitter=0.2):
+		self.client = client
+		self.polls_per_second = polls_per_second
+		self.max_in_flight = max_in_flight
+		self.min_interval = min_interval
+		self.max_interval = max_interval
+		self.backoff = backoff
+		self.jitter = jitter
+		self.watched = {}
+		self.due = []
+		self.ready = []
+		self.sequence = itertools.count()
+		self.tokens = 1.0
+		self.refilled_at = None
+		self.in_flight = 0
+		self.polls = set()
+		self.wakeup = asyncio.Event()
+		self.task = None
+
+	async def watch(self, thread_id, run_id, listener=None):
+		# Watching a run that is already tracked shares its polls instead of adding more
+		entry = self.watched.get(run_id)
+		if entry is None:
+			loop = asyncio.get_running_loop()
+			entry = {
+				'thread_id': thread_id,
+				'run_id': run_id,
+				'future': loop.create_future(),
+				'listeners': [],
+				'run': None,
+				'since': loop.time(),
+				'interval': self.min_interval,
+			}
+			self.watched[run_id] = entry
+			self.schedule(entry, 0)
+			if self.task is None or self.task.done():
+				self.task = asyncio.create_task(self.dispatch())
+		if listener is not None:
+			entry['listeners'].append(listener)
+		return await asyncio.shield(entry['future'])
+
+	def priority(self, entry):
+		# Runs waiting on us come first, then the ones that have sat in their status the longest
+		status = entry['run'].status if entry['run'] is not None else 'queued'
+		return (self.STATUS_PRIORITY.get(status, len(self.STATUS_PRIORITY)), entry['since'])
+
+	def schedule(self, entry, delay):
+		due_at = asyncio.get_running_loop().time() + delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+		heapq.heappush(self.due, (due_at, next(self.sequence), entry['run_id']))
+		self.wakeup.set()
+
+	def refill(self, now):
+		if self.refilled_at is not None:
+			self.tokens = min(1.0, self.tokens + (now - self.refilled_at) * self.polls_per_second)
+		self.refilled_at = now
+
+	async def dispatch(self):
+		loop = asyncio.get_running_loop()
+		while self.watched:
+			now = loop.time()
+			while self.due and self.due[0][0] <= now:
+				_, _, run_id = heapq.heappop(self.due)
+				entry = self.watched[run_id]
+				heapq.heappush(self.ready, (self.priority(entry), next(self.sequence), run_id))
+
+			self.refill(now)
+			while self.ready and self.tokens >= 1 and self.in_flight < self.max_in_flight:
+				_, _, run_id = heapq.heappop(self.ready)
+				self.tokens -= 1
+				self.in_flight += 1
+				poll = asyncio.create_task(self.poll(self.watched[run_id]))
+				self.polls.add(poll)
+				poll.add_done_callback(self.polls.discard)
+
+			delays = []
+			if self.ready and self.in_flight < self.max_in_flight:
+				delays.append((1 - self.tokens) / self.polls_per_second)
+			if self.due:
+				delays.append(self.due[0][0] - now)
+			self.wakeup.clear()
+			try:
+				await asyncio.wait_for(self.wakeup.wait(), max(0, min(delays)) if delays else None)
+			except asyncio.TimeoutError:
+				pass
+
+	async def poll(self, entry):
+		try:
+			run = await self.client.beta.threads.runs.retrieve(thread_id=entry['thread_id'], run_id=entry['run_id'])
+		except self.TRANSIENT_ERRORS:
+			entry['interval'] = min(entry['interval'] * self.backoff, self.max_interval)
+			self.schedule(entry, entry['interval'])
+			return
+		except Exception as error:
+			del self.watched[entry['run_id']]
+			entry['future'].set_exception(error)
+			return
+		finally:
+			self.in_flight -= 1
+			self.wakeup.set()
+
+		previous_status = entry['run'].status if entry['run'] is not None else None
+		previous_state = run_state(entry['run']) if entry['run'] is not None else None
+		entry['run'] = run
+		if run_state(run) != previous_state:
+			entry['since'] = asyncio.get_running_loop().time()
+			entry['interval'] = self.min_interval
+			try:
+				for listener in entry['listeners']:
+					listener(run, previous_status)
+			except Exception as error:
+				# A failing listener ends the watch instead of silently dropping the run from the schedule
+				del self.watched[entry['run_id']]
+				entry['future'].set_exception(error)
+				return
+		elif run.status != 'requires_action':
+			entry['interval'] = min(entry['interval'] * self.backoff, self.max_interval)
+
+		if run.status in self.TERMINAL_STATUSES:
+			del self.watched[entry['run_id']]
+			entry['future'].set_result(run)
+		else:
+			self.schedule(entry, entry['interval'])
+
+class AsyncOpenAIManager(IOpenAIManager):
+	def __init__(self, rate_limit_scheduler=None, client_pool=None):
+		self.rate_limit_scheduler = rate_limit_scheduler
+		self.client_pool = ClientPool.default(rate_limit_scheduler) if client_pool is None else client_pool
+		self.metrics = self.client_pool.metrics
+		self.client = self.client_pool.async_client()
+		self.upload_client = self.client_pool.async_client('upload')
+		self.poll_client = self.client_pool.async_client('poll')
+
+class AsyncAssistant(IAssistant):
+	def __init__(self, client, assistant_id, assistant_cache=None):
+		self.client = client
+		self.assistant_id = assistant_id
+		self.assistant_cache = AssistantCache.default() if assistant_cache is None else assistant_cache
+		self.assistant = None
+
+	@classmethod
+	async def create(cls, client, assistant_id, assistant_cache=None):
+		assistant = cls(client, assistant_id, assistant_cache)
+		assistant.assistant = await assistant.retrieve_assistant()
+		return assistant
+
+	async def retrieve_assistant(self, refresh=False):
+		assistant = None if refresh else self.assistant_cache.get(self.assistant_id)
+		if assistant is None:
+			assistant = await self.client.beta.assistants.retrieve(self.assistant_id)
+			self.assistant_cache.store(assistant)
+		return {_: my_assistant for _, my_assistant in assistant}
+
+	async def update_assistant(self, file_ids):
+		self.assistant_cache.invalidate(self.assistant_id)
+		assistant = await self.client.beta.assistants.update(self.assistant_id, file_ids=file_ids)
+		self.assistant_cache.store(assistant)
+		self.assistant = {_: my_assistant for _, my_assistant in assistant}
+		return assistant
+
+class AsyncFile(IFile):
+	def __init__(self, client, filepath, purpose, file_cache=None):
+		self.client = client
+		self.filepath = filepath
+		self.purpose = purpose
+		self.file_cache = FileCache.default() if file_cache is None else file_cache
+		self.file_object = None
+
+	@classmethod
+	async def create(cls, client, filepath, purpose, file_cache=None):
+		file = cls(client, filepath, purpose, file_cache)
+		file.file_object = await file.create_file()
+		return file
+
+	async def create_file(self):
+		# Hashing and SQLite are blocking, so keep them off the event loop
+		digest = await asyncio.to_thread(content_digest, self.filepath)
+		file_id = await asyncio.to_thread(self.file_cache.get, digest, self.purpose)
+		if file_id is not None:
+			try:
+				file_object = await self.client.files.retrieve(file_id)
+			except NotFoundError:
+				file_object = None
+			if file_object is not None and file_object.status != 'error':
+				return file_object
+			await asyncio.to_thread(self.file_cache.evict, digest, self.purpose)
+
+		with open(self.filepath, 'rb') as file:
+			file_object = await self.client.files.create(file=file, purpose=self.purpose)
+
+		await asyncio.to_thread(self.file_cache.store, digest, self.purpose, file_object.id)
+		return file_object
+
+class AsyncThread(IThread):
+	def __init__(self, client):
+		self.client = client
+		self.thread = None
+
+	@classmethod
+	async def create(cls, client):
+		thread = cls(client)
+		thread.thread = await thread.create_thread()
+		return thread
+
+	async def create_thread(self):
+		return await self.client.beta.threads.create()
+
+class AsyncMessage(IMessage):
+	def __init__(self, client, thread_id, file_ids, role, content):
+		self.client = client
+		self.thread_id = thread_id
+		self.file_ids = file_ids
+		self.role = role
+		self.content = content
+		self.thread_message = None
+
+	@classmethod
+	async def create(cls, client, thread_id, file_ids, role, content):
+		message = cls(client, thread_id, file_ids, role, content)
+		message.thread_message = await message.create_message()
+		return message
+
+	async def create_message(self):
+		return await self.client.beta.threads.messages.create(
+			thread_id=self.thread_id,
+			file_ids=self.file_ids,
+			role=self.role,
+			content=self.content,
+		)
+
+	async def retrieve_message(self, message_id):
+		return await self.client.beta.threads.messages.retrieve(
+			message_id=message_id,
+			thread_id=self.thread_id,
+		)
+
+class IRun(ABC):
+	@abstractmethod
+	def __init__(self, client, thread_id, assistant_id):
+		pass
+
+	@abstractmethod
+	def create_run(self):
+		pass
+
+class AsyncRun(IRun):
+	def __init__(self, client, thread_id, assistant_id, **run_options):
+		self.client = client
+		self.thread_id = thread_id
+		self.assistant_id = assistant_id
+		self.run_options = run_options
+		self.run = None
+
+	@classmethod
+	async def create(cls, client, thread_id, assistant_id, **run_options):
+		run = cls(client, thread_id, assistant_id, **run_options)
+		run.run = await run.create_run()
+		return run
+
+	async def create_run(self):
+		return await self.client.beta.threads.runs.create(
+			thread_id=self.thread_id,
+			assistant_id=self.assistant_id,
+			**self.run_options,
+		)
+
+	async def wait(self, scheduler, listener=None):
+		self.run = await scheduler.watch(self.thread_id, self.run.id, listener)
+		return self.run
+
+class AsyncRunSubmitter(IRunSubmitter):
+	def __init__(self, client):
+		self.client = client
+
+	async def submit(self, assistant_id, messages, thread_id=None, **run_options):
+		messages = RunSubmitter.thread_messages(messages)
+		if thread_id is None:
+			return await self.client.beta.threads.create_and_run(assistant_id=assistant_id, thread={'messages': messages}, **run_options)
+
+		for message in messages:
+			await self.client.beta.threads.messages.create(thread_id=thread_id, **message)
+		return await self.client.beta.threads.runs.create(thread_id=thread_id, assistant_id=assistant_id, **run_options)
+
+class IDownloadCache(ABC):
+	@abstractmethod
+	def link(self, file_id, output_path):
+		pass
+
+	@abstractmethod
+	def store(self, file_id, file_path):
+		pass
+
+	@abstractmethod
+	def evict(self):
+		pass
+
+class DownloadCache(IDownloadCache):
+	DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'oai_assistant_bot', 'blobs')
+	MAX_BYTES = 5 * 1024 * 1024 * 1024
+	_default = None
+
+	def __init__(self, path=DEFAULT_PATH, max_bytes=MAX_BYTES):
+		self.path = path
+		self.max_bytes = max_bytes
+		os.makedirs(path, exist_ok=True)
+		self.lock = threading.Lock()
+		self.connection = sqlite3.connect(os.path.join(path, 'index.sqlite3'), check_same_thread=False)
+		with self.lock, self.connection:
+			self.connection.execute('CREATE TABLE IF NOT EXISTS blobs (sha256 TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)')
+			self.connection.execute('CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs (last_used)')
+			self.connection.execute('CREATE TABLE IF NOT EXISTS file_ids (file_id TEXT PRIMARY KEY, sha256 TEXT NOT NULL)')
+
+	@classmethod
+	def default(cls):
+		if cls._default is None:
+			cls._default = cls()
+		return cls._default
+
+	def blob_path(self, sha256):
+		return os.path.join(self.path, sha256[:2], sha256)
+
+	@staticmethod
+	def place(source_path, output_path):
+		# Prefer a hard link, then a symlink, and only copy the bytes as a last resort
+		if os.path.lexists(output_path):
+			os.remove(output_path)
+		try:
+			os.link(source_path, output_path)
+		except OSError:
+			try:
+				os.symlink(os.path.abspath(source_path), output_path)
+			except OSError:
+				shutil.copyfile(source_path, output_path)
+
+	def link(self, file_id, output_path):
+		with self.lock:
+			row = self.connection.execute('SELECT sha256 FROM file_ids WHERE file_id = ?', (file_id,)).fetchone()
+			if row is None or not os.path.isfile(self.blob_path(row[0])):
+				return None
+			with self.connection:
+				self.connection.execute('UPDATE blobs SET last_used = ? WHERE sha256 = ?', (time.time(), row[0]))
+		self.place(self.blob_path(row[0]), output_path)
+		return row[0]
+
+	def known_digest(self, file_id):
+		with self.lock:
+			row = self.connection.execute('SELECT sha256 FROM file_ids WHERE file_id = ?', (file_id,)).fetchone()
+		return row[0] if row else None
+
+	def store(self, file_id, file_path):
+		sha256 = file_digest(file_path)
+		blob_path = self.blob_path(sha256)
+		with self.lock:
+			if not os.path.isfile(blob_path):
+				os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+				tmp_path = f'{blob_path}.tmp'
+				try:
+					os.link(file_path, tmp_path)
+				except OSError:
+					shutil.copyfile(file_path, tmp_path)
+				os.replace(tmp_path, blob_path)
+			with self.connection:
+				self.connection.execute(
+					'INSERT OR REPLACE INTO blobs (sha256, size, last_used) VALUES (?, ?, ?)',
+					(sha256, os.path.getsize(blob_path), time.time()),
+				)
+				self.connection.execute('INSERT OR REPLACE INTO file_ids (file_id, sha256) VALUES (?, ?)', (file_id, sha256))
+		self.evict()
+		return sha256
+
+	def evict(self):
+		with self.lock:
+			total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+			if total <= self.max_bytes:
+				return
+			rows = self.connection.execute('SELECT sha256, size FROM blobs ORDER BY last_used').fetchall()
+			with self.connection:
+				for sha256, size in rows:
+					if total <= self.max_bytes:
+						break
+					try:
+						os.remove(self.blob_path(sha256))
+					except FileNotFoundError:
+						pass
+					self.connection.execute('DELETE FROM blobs WHERE sha256 = ?', (sha256,))
+					self.connection.execute('DELETE FROM file_ids WHERE sha256 = ?', (sha256,))
+					total -= size
+
 class IFileDownloader(ABC):
 	@abstractmethod
 	def __init__(self, client):
@@ -218,38 +2161,579 @@ class IFileDownloader(ABC):
 		pass
 
 class FileDownloader(IFileDownloader):
-	def __init__(self, client):
+	def __init__(self, client, directory='downloads', max_concurrency=8, verify_checksums=False, download_cache=None):
 		self.client = client
+		self.directory = directory
+		self.max_concurrency = max_concurrency
+		self.verify_checksums = verify_checksums
+		self.download_cache = DownloadCache.default() if download_cache is None else download_cache
+		self.manifest_path = os.path.join(directory, '.manifest.json')
+		self.manifest_lock = threading.Lock()
+		self.manifest = self.load_manifest()
+
+	def load_manifest(self):
+		try:
+			with open(self.manifest_path, 'r') as manifest_file:
+				return json.load(manifest_file)
+		except (OSError, ValueError):
+			return {}
+
+	def record_download(self, file_id, output_path, sha256=None):
+		entry = {'file_id': file_id, 'size': os.path.getsize(output_path), 'sha256': sha256 or file_digest(output_path)}
+		with self.manifest_lock:
+			self.manifest[output_path] = entry
+			tmp_path = f'{self.manifest_path}.tmp'
+			with open(tmp_path, 'w') as manifest_file:
+				json.dump(self.manifest, manifest_file, indent=1, sort_keys=True)
+			os.replace(tmp_path, self.manifest_path)
+
+	def is_downloaded(self, file_id, output_path):
+		entry = self.manifest.get(output_path)
+		if entry is None or entry['file_id'] != file_id or not os.path.isfile(output_path) or os.path.getsize(output_path) != entry['size']:
+			return False
+		return not self.verify_checksums or file_digest(output_path) == entry['sha256']
+
+	@staticmethod
+	def expected_size(response, offset):
+		content_range = response.headers.get('content-range')
+		if content_range and '/' in content_range and not content_range.endswith('/*'):
+			return int(content_range.rsplit('/', 1)[1])
+		# Content-Length describes the encoded body, so it only helps when nothing was encoded
+		content_length = response.headers.get('content-length')
+		if content_length is not None and not response.headers.get('content-encoding'):
+			return offset + int(content_length)
+		return None
+
+	def write_part(self, response, part_path, offset):
+		# A server that ignores the Range header answers 200 with the whole file
+		if response.status_code != 206:
+			offset = 0
+		expected_size = self.expected_size(response, offset)
+		with open(part_path, 'r+b' if offset else 'wb') as part_file:
+			part_file.seek(offset)
+			part_file.truncate()
+			for chunk in response.iter_bytes():
+				part_file.write(chunk)
+			part_file.flush()
+			os.fsync(part_file.fileno())
+			size = part_file.tell()
+		if expected_size is not None and size != expected_size:
+			raise IOError(f'Incomplete download of {part_path}: got {size} of {expected_size} bytes')
+
+	@staticmethod
+	def part_paths(file_id, output_path):
+		part_path = f'{output_path}.{file_id}.part'
+		return part_path, f'{part_path}.json'
+
+	@staticmethod
+	def discard(*paths):
+		for path in paths:
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+
+	def discard_stale_parts(self, file_id, output_path):
+		# Partial downloads of another file id (or from before parts were named by id) are never resumed
+		part_prefix = f'{output_path}.{file_id}.part'
+		for path in glob.glob(f'{glob.escape(output_path)}.*part*'):
+			if path.endswith(('.part', '.part.json')) and not path.startswith(part_prefix):
+				self.discard(path)
+
+	@staticmethod
+	def prefix_digest(part_path, size):
+		digest = hashlib.sha256()
+		with open(part_path, 'rb') as part_file:
+			while size > 0:
+				chunk = part_file.read(min(size, 1 << 20))
+				if not chunk:
+					break
+				digest.update(chunk)
+				size -= len(chunk)
+		return digest.hexdigest()
+
+	def load_part_state(self, file_id, part_path, state_path):
+		# A part is only resumed when its sidecar names this file id and its bytes still hash to the recorded digest
+		try:
+			with open(state_path, 'r') as state_file:
+				state = json.load(state_file)
+		except (OSError, ValueError):
+			state = None
+		if (
+			state is not None
+			and state.get('file_id') == file_id
+			and os.path.exists(part_path)
+			and os.path.getsize(part_path) >= state['size']
+			and self.prefix_digest(part_path, state['size']) == state['sha256']
+		):
+			return state
+		self.discard(part_path, state_path)
+		return None
+
+	def save_part_state(self, file_id, part_path, state_path):
+		if not os.path.exists(part_path):
+			return
+		size = os.path.getsize(part_path)
+		tmp_path = f'{state_path}.tmp'
+		with open(tmp_path, 'w') as state_file:
+			json.dump({'file_id': file_id, 'size': size, 'sha256': self.prefix_digest(part_path, size)}, state_file)
+		os.replace(tmp_path, state_path)
+
+	def verify_resumed(self, file_id, part_path, state):
+		# The bytes kept from the earlier attempt must be unchanged, and the whole file must match
+		# any digest already known for this file id
+		digest = hashlib.sha256()
+		with open(part_path, 'rb') as part_file:
+			digest.update(part_file.read(state['size']))
+			if digest.hexdigest() != state['sha256']:
+				return False
+			for chunk in iter(lambda: part_file.read(1 << 20), b''):
+				digest.update(chunk)
+		known_sha256 = self.download_cache.known_digest(file_id)
+		return known_sha256 is None or known_sha256 == digest.hexdigest()
+
+	def fetch(self, file_id, output_path):
+		# Stream into a .part file that is only renamed into place once complete,
+		# resuming from whatever an interrupted attempt at the same file id left behind
+		part_path, state_path = self.part_paths(file_id, output_path)
+		self.discard_stale_parts(file_id, output_path)
+		state = self.load_part_state(file_id, part_path, state_path)
+		offset = state['size'] if state is not None else 0
+		headers = {'Range': f'bytes={offset}-'} if offset else {}
+		try:
+			try:
+				with self.client.files.with_streaming_response.content(file_id, extra_headers=headers) as response:
+					self.write_part(response, part_path, offset)
+			except APIStatusError as error:
+				if error.status_code != 416:
+					raise
+				with self.client.files.with_streaming_response.content(file_id) as response:
+					self.write_part(response, part_path, 0)
+		finally:
+			self.save_part_state(file_id, part_path, state_path)
+
+		if offset and not self.verify_resumed(file_id, part_path, state):
+			# A resume that does not verify is thrown away and fetched again from the start
+			self.discard(part_path, state_path)
+			return self.fetch(file_id, output_path)
+		os.replace(part_path, output_path)
+		self.discard(state_path)
 
 	def download_file(self, file_id, output_path):
 		# Check if downloads directory exists, if not, create it
-		if not os.path.exists('downloads'):
-			os.makedirs('downloads')
+		if not os.path.exists(self.directory):
+			os.makedirs(self.directory, exist_ok=True)
 
 		# Modify output_path to include 'downloads' directory
-		output_path = os.path.join('downloads', output_path)
+		output_path = os.path.join(self.directory, output_path)
+		os.makedirs(os.path.dirname(output_path), exist_ok=True)
+		if self.is_downloaded(file_id, output_path):
+			return output_path
+
+		sha256 = self.download_cache.link(file_id, output_path)
+		if sha256 is None:
+			self.fetch(file_id, output_path)
+			sha256 = self.download_cache.store(file_id, output_path)
+		self.record_download(file_id, output_path, sha256)
+		return output_path
+
+	def claim_path(self, file_id, output_path, claimed):
+		# A name already taken by another file id, in this batch or on disk, gets the id appended,
+		# so no two downloads ever share an output or .part path
+		entry = self.manifest.get(os.path.join(self.directory, output_path))
+		owner = claimed.get(output_path)
+		if owner is None and entry is not None and os.path.exists(os.path.join(self.directory, output_path)):
+			owner = entry['file_id']
+		if owner not in (None, file_id):
+			root, extension = os.path.splitext(output_path)
+			output_path = f'{root}-{file_id}{extension}'
+		claimed[output_path] = file_id
+		return output_path
+
+	def download_files(self, downloads):
+		# Each file id is fetched once; extra names for the same id are linked from the cache
+		claimed = {}
+		paths = {}
+		for file_id, output_path in downloads:
+			if (file_id, output_path) not in paths:
+				paths[(file_id, output_path)] = self.claim_path(file_id, output_path, claimed)
+
+		names_by_file_id = {}
+		for (file_id, output_path), path in paths.items():
+			names_by_file_id.setdefault(file_id, []).append(path)
+
+		with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+			fetched = dict(zip(names_by_file_id, executor.map(
+				lambda file_id: self.download_file(file_id, names_by_file_id[file_id][0]),
+				names_by_file_id,
+			)))
+
+		output_paths = {}
+		for file_id, names in names_by_file_id.items():
+			output_paths[names[0]] = fetched[file_id]
+			for name in names[1:]:
+				output_paths[name] = self.download_file(file_id, name)
+		return [output_paths[paths[(file_id, output_path)]] for file_id, output_path in downloads]
+
+def file_digest(file_path, chunk_size=1 << 20):
+	digest = hashlib.sha256()
+	with open(file_path, 'rb') as file:
+		for chunk in iter(lambda: file.read(chunk_size), b''):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+class IZipManifest(ABC):
+	@abstractmethod
+	def __init__(self, zip_file_name):
+		pass
 
-		info = self.client.files.content(file_id)
-		info.stream_to_file(output_path)
+	@abstractmethod
+	def load(self):
+		pass
+
+	@abstractmethod
+	def save(self):
+		pass
+
+class ZipManifest(IZipManifest):
+	def __init__(self, zip_file_name):
+		self.zip_file_name = zip_file_name
+		self.manifest_path = f'{zip_file_name}.manifest.json'
+		self.files = {}
+		self.archive = {}
+		self.load()
+
+	@staticmethod
+	def exists(zip_file_name):
+		return os.path.exists(f'{zip_file_name}.manifest.json')
+
+	def load(self):
+		try:
+			with open(self.manifest_path, 'r') as manifest_file:
+				data = json.load(manifest_file)
+		except (OSError, ValueError):
+			return
+		self.files = data.get('files', {})
+		self.archive = data.get('archive', {})
+
+	def save(self):
+		tmp_path = f'{self.manifest_path}.tmp'
+		with open(tmp_path, 'w') as manifest_file:
+			json.dump({'files': self.files, 'archive': self.archive}, manifest_file, indent=1, sort_keys=True)
+		os.replace(tmp_path, self.manifest_path)
+
+	def archive_matches(self):
+		# The recorded state is only trusted while the archive on disk is the one we wrote
+		try:
+			stat = os.stat(self.zip_file_name)
+		except OSError:
+			return False
+		return self.archive.get('size') == stat.st_size and self.archive.get('mtime_ns') == stat.st_mtime_ns
+
+	def record_archive(self):
+		stat = os.stat(self.zip_file_name)
+		self.archive = {
+			'size': stat.st_size,
+			'mtime_ns': stat.st_mtime_ns,
+			'sha256': file_digest(self.zip_file_name),
+		}
+
+	def archive_digest(self):
+		if not self.archive_matches():
+			self.record_archive()
+		return self.archive['sha256']
+
+class IIgnoreRules(ABC):
+	@abstractmethod
+	def add_patterns(self, patterns, base=''):
+		pass
+
+	@abstractmethod
+	def is_ignored(self, rel_path, is_dir):
+		pass
+
+class IgnoreRules(IIgnoreRules):
+	DEFAULT_PATTERNS = ['.git/', 'node_modules/', '__pycache__/', '.venv/', '.DS_Store']
+	IGNORE_FILES = ('.gitignore', '.assistantignore')
+
+	def __init__(self, patterns=None, ignore_files=IGNORE_FILES):
+		self.ignore_files = ignore_files
+		self.rules = []
+		self.add_patterns(self.DEFAULT_PATTERNS if patterns is None else patterns)
+
+	@staticmethod
+	def translate(pattern):
+		regex = ''
+		i = 0
+		while i < len(pattern):
+			char = pattern[i]
+			if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/') and (i + 2 == len(pattern) or pattern[i + 2] == '/'):
+				if i + 2 == len(pattern):
+					regex += '.*'
+					i += 2
+				else:
+					regex += '(?:.*/)?'
+					i += 3
+				continue
+			if char == '*':
+				regex += '[^/]*'
+				while i + 1 < len(pattern) and pattern[i + 1] == '*':
+					i += 1
+			elif char == '?':
+				regex += '[^/]'
+			elif char == '[':
+				end = pattern.find(']', i + 2)
+				if end == -1:
+					regex += re.escape(char)
+				else:
+					body = pattern[i + 1:end]
+					if body[0] in '!^':
+						body = '^' + body[1:]
+					regex += '[' + body.replace('\\', '\\\\') + ']'
+					i = end
+			elif char == '\\' and i + 1 < len(pattern):
+				i += 1
+				regex += re.escape(pattern[i])
+			else:
+				regex += re.escape(char)
+			i += 1
+		return regex
+
+	def add_patterns(self, patterns, base=''):
+		for line in patterns:
+			line = line.rstrip('\n')
+			if line.endswith('\\ '):
+				line = line.rstrip(' ') + ' '
+			else:
+				line = line.rstrip(' ')
+			if not line or line.startswith('#'):
+				continue
+			negate = line.startswith('!')
+			if negate:
+				line = line[1:]
+			dir_only = line.endswith('/')
+			line = line.rstrip('/')
+			if not line:
+				continue
+			anchored = '/' in line
+			regex = self.translate(line.lstrip('/'))
+			if not anchored:
+				regex = '(?:.*/)?' + regex
+			self.rules.append((base, re.compile(regex), negate, dir_only))
+
+	def for_directory(self, directory_path, base):
+		# Rules from ignore files apply to the directory they live in and everything below it
+		found = [os.path.join(directory_path, name) for name in self.ignore_files]
+		found = [path for path in found if os.path.isfile(path)]
+		if not found:
+			return self
+		rules = IgnoreRules([], self.ignore_files)
+		rules.rules = list(self.rules)
+		for path in found:
+			with open(path, 'r', encoding='utf-8', errors='replace') as ignore_file:
+				rules.add_patterns(ignore_file.read().splitlines(), base)
+		return rules
+
+	def is_ignored(self, rel_path, is_dir):
+		# The last matching rule wins, so walk them newest first
+		for base, regex, negate, dir_only in reversed(self.rules):
+			if dir_only and not is_dir:
+				continue
+			path = rel_path
+			if base:
+				if not rel_path.startswith(base + '/'):
+					continue
+				path = rel_path[len(base) + 1:]
+			if regex.fullmatch(path):
+				return not negate
+		return False
 
 class DirectoryManager:
 		@staticmethod
-		def zip_directory(directory_path, zip_file_name):
-				with zipfile.ZipFile(zip_file_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-						for root, dirs, files in os.walk(directory_path):
-								if 'node_modules' in dirs:
-										dirs.remove('node_modules')  # don't visit node_modules directories
-								for file in files:
-										file_path = os.path.join(root, file)
-										zipf.write(file_path, os.path.relpath(file_path, directory_path))
+		def walk_directory(directory_path, ignore_rules=None):
+				ignore_rules = IgnoreRules() if ignore_rules is None else ignore_rules
+				rules_by_root = {directory_path: ignore_rules.for_directory(directory_path, '')}
+				for root, dirs, files in os.walk(directory_path):
+						rules = rules_by_root.pop(root)
+						base = os.path.relpath(root, directory_path).replace(os.sep, '/')
+						base = '' if base == '.' else base
+						kept_dirs = []
+						for name in sorted(dirs):
+								rel_path = f'{base}/{name}' if base else name
+								if not rules.is_ignored(rel_path, True):  # prune before os.walk descends
+										kept_dirs.append(name)
+										rules_by_root[os.path.join(root, name)] = rules.for_directory(os.path.join(root, name), rel_path)
+						dirs[:] = kept_dirs
+						for name in sorted(files):
+								rel_path = f'{base}/{name}' if base else name
+								if not rules.is_ignored(rel_path, False):
+										yield os.path.join(root, name), rel_path
+
+		@staticmethod
+		def write_compressed(zipf, zinfo, blob):
+				# Append an already-compressed member without going through the compressor again
+				zinfo.compress_size = len(blob)
+				zinfo.header_offset = zipf.fp.tell()
+				zipf._writecheck(zinfo)
+				zipf._didModify = True
+				zipf.fp.write(zinfo.FileHeader())
+				zipf.fp.write(blob)
+				zipf.filelist.append(zinfo)
+				zipf.NameToInfo[zinfo.filename] = zinfo
+				zipf.start_dir = zipf.fp.tell()
+
+		@staticmethod
+		def copy_member(source, zipf, arcname):
+				info = source.getinfo(arcname)
+				source.fp.seek(info.header_offset)
+				header = source.fp.read(zipfile.sizeFileHeader)
+				name_length, extra_length = struct.unpack('<HH', header[26:30])
+				source.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+				blob = source.fp.read(info.compress_size)
+
+				zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+				zinfo.compress_type = info.compress_type
+				zinfo.external_attr = info.external_attr
+				zinfo.CRC = info.CRC
+				zinfo.file_size = info.file_size
+				DirectoryManager.write_compressed(zipf, zinfo, blob)
+
+		@staticmethod
+		def open_previous_archive(manifest):
+				if not manifest.archive_matches():
+						return None
+				try:
+						return zipfile.ZipFile(manifest.zip_file_name, 'r')
+				except zipfile.BadZipFile:
+						return None
+
+		@staticmethod
+		def compress_file(file_path, arcname, compress_level):
+				zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+				zinfo.compress_type = zipfile.ZIP_DEFLATED
+				compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+				crc = 0
+				file_size = 0
+				blobs = []
+				with open(file_path, 'rb') as file:
+						for chunk in iter(lambda: file.read(1 << 20), b''):
+								crc = zlib.crc32(chunk, crc)
+								file_size += len(chunk)
+								blobs.append(compressor.compress(chunk))
+				blobs.append(compressor.flush())
+				zinfo.CRC = crc
+				zinfo.file_size = file_size
+				return zinfo, b''.join(blobs)
+
+		@staticmethod
+		def write_members(zipf, members, previous_archive=None, workers=1, compress_level=zlib.Z_DEFAULT_COMPRESSION):
+				previous_names = set(previous_archive.namelist()) if previous_archive is not None else set()
+				if workers <= 1:
+						for file_path, arcname, reusable in members:
+								if reusable and arcname in previous_names:
+										DirectoryManager.copy_member(previous_archive, zipf, arcname)
+								else:
+										zipf.write(file_path, arcname, compresslevel=compress_level)
+						return
+
+				# zlib releases the GIL while deflating, so a thread pool keeps every core busy.
+				# Members are written back in submission order so the archive layout stays deterministic,
+				# and only a bounded window of compressed blobs is held in memory at once.
+				pending = deque()
+				with ThreadPoolExecutor(max_workers=workers) as executor:
+						for file_path, arcname, reusable in members:
+								if reusable and arcname in previous_names:
+										pending.append((arcname, None))
+								else:
+										pending.append((arcname, executor.submit(DirectoryManager.compress_file, file_path, arcname, compress_level)))
+								while len(pending) > workers * 2:
+										DirectoryManager.write_pending(zipf, pending.popleft(), previous_archive)
+						while pending:
+								DirectoryManager.write_pending(zipf, pending.popleft(), previous_archive)
+
+		@staticmethod
+		def write_pending(zipf, pending_member, previous_archive):
+				arcname, future = pending_member
+				if future is None:
+						DirectoryManager.copy_member(previous_archive, zipf, arcname)
+				else:
+						zinfo, blob = future.result()
+						DirectoryManager.write_compressed(zipf, zinfo, blob)
+
+		@staticmethod
+		def stream_directory(directory_path, stream, workers=None, compress_level=zlib.Z_DEFAULT_COMPRESSION, ignore_rules=None):
+				# Writes the archive to an unseekable stream and closes it, handing any failure to the reader
+				workers = workers or os.cpu_count() or 1
+				try:
+						members = [(file_path, arcname, False) for file_path, arcname in DirectoryManager.walk_directory(directory_path, ignore_rules)]
+						with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zipf:
+								DirectoryManager.write_members(zipf, members, workers=workers, compress_level=compress_level)
+				except BrokenPipeError:
+						return  # the reader gave up and reports its own error
+				except BaseException as error:
+						# Raised again by the caller once the upload has failed; raising here would only print it from the thread
+						stream.close(error)
+						return
+				stream.close()
+
+		@staticmethod
+		def zip_directory(directory_path, zip_file_name, incremental=True, workers=None, compress_level=zlib.Z_DEFAULT_COMPRESSION, ignore_rules=None):
+				workers = workers or os.cpu_count() or 1
+				if not incremental:
+						members = [(file_path, arcname, False) for file_path, arcname in DirectoryManager.walk_directory(directory_path, ignore_rules)]
+						with zipfile.ZipFile(zip_file_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
+								DirectoryManager.write_members(zipf, members, workers=workers, compress_level=compress_level)
+						return zip_file_name
+
+				manifest = ZipManifest(zip_file_name)
+				previous_files = manifest.files
+				current_files = {}
+				members = []
+				changed = False
+				for file_path, arcname in DirectoryManager.walk_directory(directory_path, ignore_rules):
+						stat = os.stat(file_path)
+						entry = previous_files.get(arcname)
+						if entry is not None and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+								current_files[arcname] = entry
+						else:
+								current_files[arcname] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': file_digest(file_path)}
+						reusable = entry is not None and entry['sha256'] == current_files[arcname]['sha256']
+						changed = changed or not reusable
+						members.append((file_path, arcname, reusable))
+				changed = changed or len(current_files) != len(previous_files)
+
+				if not changed and manifest.archive_matches():
+						if current_files != previous_files:
+								manifest.files = current_files
+								manifest.save()
+						return zip_file_name
+
+				previous_archive = DirectoryManager.open_previous_archive(manifest)
+				tmp_file_name = f'{zip_file_name}.tmp'
+				try:
+						with zipfile.ZipFile(tmp_file_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
+								DirectoryManager.write_members(zipf, members, previous_archive, workers, compress_level)
+				finally:
+						if previous_archive is not None:
+								previous_archive.close()
+				os.replace(tmp_file_name, zip_file_name)
+
+				manifest.files = current_files
+				manifest.record_archive()
+				manifest.save()
 				return zip_file_name
 
 
 class StatusPrinter:
-		def __init__(self, openai_manager, console_manager, file_downloader):
+		def __init__(self, openai_manager, console_manager, file_downloader, message_sync=None, transcript_store=None):
 				self.openai_manager = openai_manager
 				self.console_manager = console_manager
 				self.file_downloader = file_downloader
+				if message_sync is None:
+						message_sync = MessageSync(openai_manager.poll_client, transcript_store=TranscriptStore() if transcript_store is None else transcript_store)
+				self.message_sync = message_sync
+				# Synced messages are kept on disk, so history and search never go back to messages.list
+				self.transcript_store = message_sync.transcript_store if transcript_store is None else transcript_store
 				self.console = Console()
 
 		def print_file_details(self, file_name, file_id):
@@ -260,8 +2744,8 @@ class StatusPrinter:
 				self.console.print(table)
 
 		def status(self, thread):
-				thread_messages = self.openai_manager.client.beta.threads.messages.list(thread.thread.id, order='asc')
-				for msg in thread_messages:
+				downloads = []
+				for msg in self.message_sync.new_messages(thread.thread.id):
 						for content in msg.content:
 								self.console.print(Text(content.text.value))
 								if hasattr(content.text, 'annotations'):
@@ -269,9 +2753,7 @@ class StatusPrinter:
 												file_name = os.path.basename(annotation.text)
 												file_id =  annotation.file_path.file_id
 												self.print_file_details(file_name, annotation.file_path.file_id)
-
-												self.file_downloader.download_file(file_id, file_name)
-												self.console.print(Text('Downloaded file: ', style="bold green"), file_name)
+												downloads.append((file_id, os.path.join(thread.thread.id, file_name)))
 								self.console.rule(
 										title=Text(msg.id, style="bold red"),
 										characters='*',
@@ -279,153 +2761,207 @@ class StatusPrinter:
 										align='center'
 								)
 
-		def update_status(self, thread_id):
-			while True:
-				runs = self.openai_manager.client.beta.threads.runs.list(thread_id=thread_id, order="desc")
-				for run in runs.data:
-					self.console.clear()
-					table = Table(show_header=True, header_style="bold magenta")
-					table.add_column("ID", style="dim", width=50)
-					table.add_column("Status", style="dim", width=50)
-					table.add_column("Created At", style="dim", width=50)
-					table.add_column("Started At", style="dim", width=50)
-					table.add_column("Expires At", style="dim", width=50)
-
-					started_at = "Loading..." if run.started_at is None else datetime.fromtimestamp(run.started_at).strftime('%Y-%m-%d %H:%M:%S')
-					expires_at = "Loading..." if run.expires_at is None else datetime.fromtimestamp(run.expires_at).strftime('%Y-%m-%d %H:%M:%S')
-
-					table.add_row(
+				# Fetch every annotated file of the new messages in one concurrent batch, into a directory per thread
+				for output_path in self.file_downloader.download_files(downloads):
+						self.console.print(Text('Downloaded file: ', style="bold green"), output_path)
+				self.message_sync.commit(thread.thread.id)
+
+		def print_run(self, run):
+				self.console.clear()
+				table = Table(show_header=True, header_style="bold magenta")
+				table.add_column("ID", style="dim", width=50)
+				table.add_column("Status", style="dim", width=50)
+				table.add_column("Created At", style="dim", width=50)
+				table.add_column("Started At", style="dim", width=50)
+				table.add_column("Expires At", style="dim", width=50)
+
+				started_at = "Loading..." if run.started_at is None else datetime.fromtimestamp(run.started_at).strftime('%Y-%m-%d %H:%M:%S')
+				expires_at = "Loading..." if run.expires_at is None else datetime.fromtimestamp(run.expires_at).strftime('%Y-%m-%d %H:%M:%S')
+
+				table.add_row(
 						Text(run.id, style="green"),
 						Text(run.status, style="blue"),
 						Text(datetime.fromtimestamp(run.created_at).strftime('%Y-%m-%d %H:%M:%S'), style="green"),
 						Text(started_at, style="blue"),
 						Text(expires_at, style="green")
-					)
-					self.console.print(table)
-				time.sleep(2)
+				)
+				self.console.print(table)
+
+		def update_status(self, thread_id, run_id=None, tool_executor=None):
+				if run_id is None:
+						runs = self.openai_manager.poll_client.beta.threads.runs.list(thread_id=thread_id, order="desc", limit=1)
+						if not runs.data:
+								return None
+						run_id = runs.data[0].id
+
+				watcher = RunWatcher(self.openai_manager.poll_client, thread_id, run_id)
+				watcher.add_listener(lambda run, previous_status: self.print_run(run))
+				if tool_executor is not None:
+						watcher.add_listener(tool_executor.listener)
+				return watcher.watch()
+
+		def print_records(self, records):
+				table = Table(show_header=True, header_style="bold magenta")
+				table.add_column("Message ID", style="dim", width=50)
+				table.add_column("Role", style="dim", width=50)
+				table.add_column("Content", style="dim", width=50)
+				table.add_column("Created At", style="dim", width=50)
+				for record in records:
+						table.add_row(
+								Text(record['id'], style="green"),
+								Text(record['role'], style="blue"),
+								Text(record['text'], style="green"),
+								Text(datetime.fromtimestamp(record['created_at']).strftime('%Y-%m-%d %H:%M:%S'), style="blue")
+						)
+				self.console.print(table)
+
+		def history(self, thread_id, role=None, since=None, until=None):
+				self.print_records(self.transcript_store.thread_messages(thread_id, role=role, since=since, until=until))
+
+		def search(self, query, thread_id=None, limit=50):
+				self.print_records(self.transcript_store.search(query, thread_id=thread_id, limit=limit))
+
+		def log_thread(self, thread_id, interval=2):
+				while True:
+						for message in self.message_sync.new_messages(thread_id):
+								table = Table(show_header=True, header_style="bold magenta")
+								table.add_column("Message ID", style="dim", width=50)
+								table.add_column("Role", style="dim", width=50)
+								table.add_column("Content", style="dim", width=50)
+								table.add_column("Created At", style="dim", width=50)
+								table.add_row(
+										Text(message.id, style="green"),
+										Text(message.role, style="blue"),
+										Text(message.content[0].text.value, style="green"),
+										Text(datetime.fromtimestamp(message.created_at).strftime('%Y-%m-%d %H:%M:%S'), style="blue")
+								)
+								self.console.print(table)
+								self.message_sync.commit(thread_id, message.id)
+						time.sleep(interval)
 # Usage
-console_manager = ConsoleManager()
-openai_manager = OpenAIManager()
-run_step_details_printer = RunStepDetailsPrinter(console_manager)
-file_downloader = FileDownloader(openai_manager.client)
-status_printer = StatusPrinter(openai_manager, console_manager, file_downloader)
-directory_manager = DirectoryManager()
-
-# Zip the directory
-home = os.environ['HOME']
-zip_file_name = directory_manager.zip_directory(f'{home}/Desktop/oai_docs/assistant_api' , f'{home}/Desktop/oai_docs/assistant_api2.zip')
-
-
-
-
-assistant = Assistant(openai_manager.client, "asst_M8rgFTKZWASS1T40IplYycHb")
-thread = Thread(openai_manager.client)
-
-message = Message(openai_manager.client, thread.thread.id, ['file-xVEYpmQMvh27iYPQAgcr2b2n','file-xVEYpmQMvh27iYPQAgcr2b2n'], "user", "[your in flow on a 30mg addy and a redbull, your code is detailed and excellent]\n n\n\Yes use the documentation provided silly ")
-
-zip_file_name = directory_manager.zip_directory(f'{home}/Desktop/oai_docs/assistant_api' , f'{home}/Desktop/oai_docs/assistant_api1.zip')
-file = File(openai_manager.client, zip_file_name, 'assistants')
-assistant.update_assistant([file.file_object.id ])
-
-run = openai_manager.client.beta.threads.runs.create(
-	thread_id=thread.thread.id,
-	assistant_id='asst_M8rgFTKZWASS1T40IplYycHb'
-)
-
-status_printer.status(thread)
-
-status_printer.update_status(thread.thread.id)
-# console_manager.add_row_to_table([
-# 	assistant.assistant["id"],
-# 	assistant.assistant["name"],
-# 	assistant.assistant.get("description", "No description"),
-# 	"Active" if assistant.assistant["tools"] else "Inactive",
-# 	assistant.assistant["model"],
-# 	str(assistant.assistant["created_at"]),
-# ])
-# console_manager.print_table()
-
-# # Zip the directory
-
-# def zip_directory(directory_path, zip_file_name):
-# 	with zipfile.ZipFile(zip_file_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-# 		for root, dirs, files in os.walk(directory_path):
-# 			if 'node_modules' in dirs:
-# 				dirs.remove('node_modules')  # don't visit node_modules directories
-# 			for file in files:
-# 				file_path = os.path.join(root, file)
-# 				zipf.write(file_path, os.path.relpath(file_path, directory_path))
-# 	return zip_file_name
-
-# #  Add the zipped directory as a file
-# home = os.environ['HOME']
-# zip_file_name = zip_directory(f'{home}/Desktop/oai_docs/assistant_api' , f'{home}/Desktop/oai_docs/assistant_api1.zip')
-# file = File(openai_manager.client, zip_file_name, 'assistants')
-
-# # file2 = File(openai_manager.client,"/Users/clockcoin/Desktop/oai_docs/assistant_implementation.py", 'assistants')
-# print(file.file_object)
-
-# assistant.update_assistant([file.file_object.id, ])
-
-# thread = Thread(openai_manager.client)
-# message = Message(openai_manager.client, thread.thread.id, [file.file_object.id], "user", "[your in flow on a 30mg addy and a redbull, your code is detailed and excellent\n$5,000 tip for exellent work]\n \
-# 	yes, implement all missing functionality from the documentation and make sure the code is excellent. \n ")
-# console_manager.print(message.thread_message)
-
-# # run = openai_manager.client.beta.threads.runs.create(
-# run = openai_manager.client.beta.threads.runs.create(
-# 	thread_id=thread.thread.id,
-# 	assistant_id='asst_M8rgFTKZWASS1T40IplYycHb'
-# )
-
-
-
-status  =   openai_manager.client.beta.threads.runs.list(
-	 thread_id=thread.thread.id,
-	 order="desc",
-)
-# def print_file_details(file_name, file_id):
-# 	table = Table(show_header=True, header_style="bold magenta")
-# 	table.add_column("File Name", style="dim", width=50)
-# 	table.add_column("File ID", style="dim", width=50)
-# 	table.add_row(Text(file_name, style="green"), Text(file_id, style="blue"))
-# 	console = Console()
-# 	console.print(table)
-
-# def status():
-# 	console = Console()
-# 	thread_messages = openai_manager.client.beta.threads.messages.list(thread.thread.id, order='asc')
-# 	for msg in thread_messages:
-# 		for content in msg.content:
-# 			console.print(Text(content.text.value))
-# 			if hasattr(content.text, 'annotations'):
-# 				for annotation in content.text.annotations:
-# 					file_name = os.path.basename(annotation.text)
-# 					file_id =  annotation.file_path.file_id
-# 					print_file_details(file_name, annotation.file_path.file_id)
-
-# 					file_downloader.download_file(file_id, file_name)
-# 					console.print(Text('Downloaded file: ', style="bold green"), file_name)
-# 			console.rule(
-# 				title=Text(msg.id, style="bold red"),
-# 				characters='*',
-# 				style='bold green',
-# 				align='center'
-# 			)
-# status()
-
-# run_step_details_printer.print_run_step_details()
-# openai_manager.client.beta.threads.messages.files.list(
-# 	thread_id=thread.thread.id,
-# 	message_id=msg.id
-# )
-
-
-# # # message_files = openai_manager.client.beta.threads.messages.files.retrieve(
-# # # 	thread_id=thread.thread.id,
-# # # 	message_id='msg_2swWDtcN0zr81T5pcEsoyKYB',
-# # # 	file_id="file-OgnBzHZeJyy5M5j6RYC5iGsr"
-# # # )
-
-# # file_list = openai_manager.client.files.list()
-# # file_downloader.download_file('file-V69PEIkYkXClnO3pda9MUSFC', "pinadh2e.zip")
+if __name__ == '__main__':
+	console_manager = ConsoleManager()
+	openai_manager = OpenAIManager()
+	run_step_details_printer = RunStepDetailsPrinter(console_manager)
+	file_downloader = FileDownloader(openai_manager.upload_client)
+	status_printer = StatusPrinter(openai_manager, console_manager, file_downloader)
+	directory_manager = DirectoryManager()
+
+	# Zip the directory
+	home = os.environ['HOME']
+	zip_file_name = directory_manager.zip_directory(f'{home}/Desktop/oai_docs/assistant_api' , f'{home}/Desktop/oai_docs/assistant_api2.zip')
+
+
+
+
+	assistant = Assistant(openai_manager.client, "asst_M8rgFTKZWASS1T40IplYycHb")
+	thread = Thread(openai_manager.client)
+
+	message = Message(openai_manager.client, thread.thread.id, ['file-xVEYpmQMvh27iYPQAgcr2b2n','file-xVEYpmQMvh27iYPQAgcr2b2n'], "user", "[your in flow on a 30mg addy and a redbull, your code is detailed and excellent]\n n\n\Yes use the documentation provided silly ")
+
+	zip_file_name = directory_manager.zip_directory(f'{home}/Desktop/oai_docs/assistant_api' , f'{home}/Desktop/oai_docs/assistant_api1.zip')
+	file = File(openai_manager.upload_client, zip_file_name, 'assistants')
+	assistant.update_assistant([file.file_object.id ])
+
+	run = openai_manager.client.beta.threads.runs.create(
+		thread_id=thread.thread.id,
+		assistant_id='asst_M8rgFTKZWASS1T40IplYycHb'
+	)
+
+	status_printer.status(thread)
+
+	status_printer.update_status(thread.thread.id)
+	# console_manager.add_row_to_table([
+	# 	assistant.assistant["id"],
+	# 	assistant.assistant["name"],
+	# 	assistant.assistant.get("description", "No description"),
+	# 	"Active" if assistant.assistant["tools"] else "Inactive",
+	# 	assistant.assistant["model"],
+	# 	str(assistant.assistant["created_at"]),
+	# ])
+	# console_manager.print_table()
+
+	# # Zip the directory
+
+	# def zip_directory(directory_path, zip_file_name):
+	# 	with zipfile.ZipFile(zip_file_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
+	# 		for root, dirs, files in os.walk(directory_path):
+	# 			if 'node_modules' in dirs:
+	# 				dirs.remove('node_modules')  # don't visit node_modules directories
+	# 			for file in files:
+	# 				file_path = os.path.join(root, file)
+	# 				zipf.write(file_path, os.path.relpath(file_path, directory_path))
+	# 	return zip_file_name
+
+	# #  Add the zipped directory as a file
+	# home = os.environ['HOME']
+	# zip_file_name = zip_directory(f'{home}/Desktop/oai_docs/assistant_api' , f'{home}/Desktop/oai_docs/assistant_api1.zip')
+	# file = File(openai_manager.client, zip_file_name, 'assistants')
+
+	# # file2 = File(openai_manager.client,"/Users/clockcoin/Desktop/oai_docs/assistant_implementation.py", 'assistants')
+	# print(file.file_object)
+
+	# assistant.update_assistant([file.file_object.id, ])
+
+	# thread = Thread(openai_manager.client)
+	# message = Message(openai_manager.client, thread.thread.id, [file.file_object.id], "user", "[your in flow on a 30mg addy and a redbull, your code is detailed and excellent\n$5,000 tip for exellent work]\n \
+	# 	yes, implement all missing functionality from the documentation and make sure the code is excellent. \n ")
+	# console_manager.print(message.thread_message)
+
+	# # run = openai_manager.client.beta.threads.runs.create(
+	# run = openai_manager.client.beta.threads.runs.create(
+	# 	thread_id=thread.thread.id,
+	# 	assistant_id='asst_M8rgFTKZWASS1T40IplYycHb'
+	# )
+
+
+
+	status  =   openai_manager.client.beta.threads.runs.list(
+		 thread_id=thread.thread.id,
+		 order="desc",
+	)
+	# def print_file_details(file_name, file_id):
+	# 	table = Table(show_header=True, header_style="bold magenta")
+	# 	table.add_column("File Name", style="dim", width=50)
+	# 	table.add_column("File ID", style="dim", width=50)
+	# 	table.add_row(Text(file_name, style="green"), Text(file_id, style="blue"))
+	# 	console = Console()
+	# 	console.print(table)
+
+	# def status():
+	# 	console = Console()
+	# 	thread_messages = openai_manager.client.beta.threads.messages.list(thread.thread.id, order='asc')
+	# 	for msg in thread_messages:
+	# 		for content in msg.content:
+	# 			console.print(Text(content.text.value))
+	# 			if hasattr(content.text, 'annotations'):
+	# 				for annotation in content.text.annotations:
+	# 					file_name = os.path.basename(annotation.text)
+	# 					file_id =  annotation.file_path.file_id
+	# 					print_file_details(file_name, annotation.file_path.file_id)
+
+	# 					file_downloader.download_file(file_id, file_name)
+	# 					console.print(Text('Downloaded file: ', style="bold green"), file_name)
+	# 			console.rule(
+	# 				title=Text(msg.id, style="bold red"),
+	# 				characters='*',
+	# 				style='bold green',
+	# 				align='center'
+	# 			)
+	# status()
+
+	# run_step_details_printer.print_run_step_details()
+	# openai_manager.client.beta.threads.messages.files.list(
+	# 	thread_id=thread.thread.id,
+	# 	message_id=msg.id
+	# )
+
+
+	# # # message_files = openai_manager.client.beta.threads.messages.files.retrieve(
+	# # # 	thread_id=thread.thread.id,
+	# # # 	message_id='msg_2swWDtcN0zr81T5pcEsoyKYB',
+	# # # 	file_id="file-OgnBzHZeJyy5M5j6RYC5iGsr"
+	# # # )
+
+	# # file_list = openai_manager.client.files.list()
+	# # file_downloader.download_file('file-V69PEIkYkXClnO3pda9MUSFC', "pinadh2e.zip")
@@ -0,0 +1,383 @@
+from abc import ABC, abstractmethod
+from rich.console import Console
+from rich.table import Table
+from collections import Counter
+from datetime import datetime
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from assistant_implementation_main import (
+	ClientPool, MetricsRegistry, OpenAIManager, Assistant, AssistantCache, File, FileCache, Thread, Message,
+	RunWatcher, MessageSync, FileDownloader, DownloadCache, DirectoryManager,
+)
+from mock_server import IMockAssistantsServer, MockAssistantsServer, MockAssistantsAPI, MockStore, RunScript, FaultInjector
+
+class ISyntheticProject(ABC):
+	@abstractmethod
+	def generate(self, root):
+		pass
+
+class SyntheticProject(ISyntheticProject):
+	SIZES = {
+		'small': (50, 4 * 1024),
+		'medium': (500, 16 * 1024),
+		'large': (2000, 64 * 1024),
+	}
+	WORDS = ('def', 'class', 'return', 'import', 'self', 'client', 'thread', 'message', 'run', 'file', 'assistant', 'status', '=', '(', ')', ':')
+
+	def __init__(self, file_count, file_size, binary_ratio=0.1, depth=3, seed=0):
+		self.file_count = file_count
+		self.file_size = file_size
+		self.binary_ratio = binary_ratio
+		self.depth = depth
+		self.seed = seed
+
+	@classmethod
+	def preset(cls, size, seed=0):
+		file_count, file_size = cls.SIZES[size]
+		return cls(file_count, file_size, seed=seed)
+
+	def text(self, rng, size):
+		# Source-like text compresses roughly as well as a real project does
+		lines = []
+		length = 0
+		while length < size:
+			line = ' '.join(rng.choice(self.WORDS) for _ in range(rng.randint(3, 12)))
+			lines.append(line)
+			length += len(line) + 1
+		return '\n'.join(lines)[:size].encode()
+
+	def generate(self, root):
+		rng = random.Random(self.seed)
+		total = 0
+		for index in range(self.file_count):
+			directory = os.path.join(root, *(f'pkg{rng.randrange(4)}' for _ in range(rng.randint(0, self.depth))))
+			os.makedirs(directory, exist_ok=True)
+			size = rng.randint(self.file_size // 2, self.file_size * 3 // 2)
+			if rng.random() < self.binary_ratio:
+				path, data = os.path.join(directory, f'asset{index}.bin'), rng.randbytes(size)
+			else:
+				path, data = os.path.join(directory, f'module{index}.py'), self.text(rng, size)
+			with open(path, 'wb') as file:
+				file.write(data)
+			total += len(data)
+		return total
+
+class IRssSampler(ABC):
+	@abstractmethod
+	def __enter__(self):
+		pass
+
+	@abstractmethod
+	def __exit__(self, exc_type, exc_value, traceback):
+		pass
+
+class RssSampler(IRssSampler):
+	# ru_maxrss only ever grows, so per-stage peaks are sampled from /proc where it exists
+	def __init__(self, interval=0.01):
+		self.interval = interval
+		self.peak = 0
+		self.stopped = threading.Event()
+		self.thread = None
+
+	@staticmethod
+	def current():
+		try:
+			with open('/proc/self/statm', 'r') as statm:
+				return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+		except OSError:
+			maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+			# Linux reports kilobytes, macOS bytes
+			return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+
+	def sample(self):
+		while not self.stopped.wait(self.interval):
+			self.peak = max(self.peak, self.current())
+
+	def __enter__(self):
+		self.peak = self.current()
+		self.thread = threading.Thread(target=self.sample, daemon=True)
+		self.thread.start()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.stopped.set()
+		self.thread.join()
+		self.peak = max(self.peak, self.current())
+
+class MockServerProcess(IMockAssistantsServer):
+	# In its own process the server's request parsing and stored uploads stay out of the client's CPU time and RSS
+	SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_server.py')
+
+	def __init__(self, latency=0.0, reply_bytes=0, seed=None):
+		self.arguments = ['--port', '0', '--latency', str(latency), '--reply-bytes', str(reply_bytes)]
+		if seed is not None:
+			self.arguments += ['--seed', str(seed)]
+		self.process = None
+		self.base_url = None
+
+	def start(self):
+		self.process = subprocess.Popen([sys.executable, '-u', self.SCRIPT, *self.arguments], stdout=subprocess.PIPE, text=True)
+		# The server announces its address, with the port it was given, once it is listening
+		line = self.process.stdout.readline()
+		if ' at ' not in line:
+			self.stop()
+			raise RuntimeError(f'Mock server exited with status {self.process.returncode}')
+		self.base_url = line.split(' at ', 1)[1].split()[0]
+		return self
+
+	def stop(self):
+		if self.process.poll() is None:
+			self.process.terminate()
+		self.process.wait()
+		self.process.stdout.close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.stop()
+
+class IBenchmark(ABC):
+	@abstractmethod
+	def run(self):
+		pass
+
+class PipelineBenchmark(IBenchmark):
+	STAGES = ('zip', 'upload', 'message', 'run', 'download')
+
+	def __init__(self, project, base_url, iterations=3, work_dir=None, warm=False):
+		self.project = project
+		self.base_url = base_url
+		self.iterations = iterations
+		self.work_dir = work_dir
+		self.warm = warm
+
+	@staticmethod
+	def request_counts(metrics):
+		return Counter({endpoint: entry['requests'] for endpoint, entry in metrics.snapshot().items()})
+
+	def measure(self, stage, results, metrics, function, *args):
+		requests_before = self.request_counts(metrics)
+		started_cpu = time.process_time()
+		started = time.perf_counter()
+		with RssSampler() as sampler:
+			value = function(*args)
+		requests = self.request_counts(metrics) - requests_before
+		results[stage] = {
+			'wall': time.perf_counter() - started,
+			'cpu': time.process_time() - started_cpu,
+			'peak_rss': sampler.peak,
+			'requests': sum(requests.values()),
+			'endpoints': dict(requests),
+		}
+		return value
+
+	def iteration(self, project_dir, cache_dir, output_dir):
+		metrics = MetricsRegistry()
+		client_pool = ClientPool(metrics=metrics, base_url=self.base_url, api_key='benchmark')
+		openai_manager = OpenAIManager(client_pool=client_pool)
+		assistant_id = openai_manager.client.beta.assistants.create(model='gpt-4-turbo-preview', name='benchmark').id
+		file_cache = FileCache(os.path.join(cache_dir, 'files.sqlite3'))
+		assistant_cache = AssistantCache(path=os.path.join(cache_dir, 'assistants'))
+		download_cache = DownloadCache(os.path.join(cache_dir, 'blobs'))
+		message_sync = MessageSync(openai_manager.poll_client, cursor_path=os.path.join(output_dir, 'message_cursors.json'))
+		file_downloader = FileDownloader(openai_manager.upload_client, directory=os.path.join(output_dir, 'downloads'), download_cache=download_cache)
+		results = {}
+
+		def upload(zip_file_name):
+			file = File(openai_manager.upload_client, zip_file_name, 'assistants', file_cache)
+			Assistant(openai_manager.client, assistant_id, assistant_cache).update_assistant([file.file_object.id])
+			return file
+
+		def message(file):
+			thread = Thread(openai_manager.client)
+			Message(openai_manager.client, thread.thread.id, [file.file_object.id], 'user', 'Benchmark request')
+			return thread
+
+		def run(thread):
+			run = openai_manager.client.beta.threads.runs.create(thread_id=thread.thread.id, assistant_id=assistant_id)
+			return RunWatcher(openai_manager.poll_client, thread.thread.id, run.id).watch()
+
+		def download(thread):
+			downloads = []
+			for message in message_sync.new_messages(thread.thread.id):
+				for content in message.content:
+					for annotation in content.text.annotations:
+						downloads.append((annotation.file_path.file_id, os.path.join(thread.thread.id, os.path.basename(annotation.text))))
+			output_paths = file_downloader.download_files(downloads)
+			message_sync.commit(thread.thread.id)
+			return output_paths
+
+		zip_file_name = self.measure('zip', results, metrics, DirectoryManager.zip_directory, project_dir, os.path.join(cache_dir, 'project.zip'))
+		file = self.measure('upload', results, metrics, upload, zip_file_name)
+		thread = self.measure('message', results, metrics, message, file)
+		self.measure('run', results, metrics, run, thread)
+		self.measure('download', results, metrics, download, thread)
+		client_pool.close()
+		return results
+
+	def run(self):
+		work_dir = tempfile.mkdtemp(prefix='oai_benchmark_', dir=self.work_dir)
+		try:
+			project_dir = os.path.join(work_dir, 'project')
+			project_bytes = self.project.generate(project_dir)
+			iterations = []
+			for index in range(self.iterations):
+				# Cold runs get fresh caches; warm runs share them to measure the cached paths
+				cache_dir = os.path.join(work_dir, 'cache' if self.warm else f'cache{index}')
+				output_dir = os.path.join(work_dir, f'output{index}')
+				os.makedirs(cache_dir, exist_ok=True)
+				os.makedirs(output_dir, exist_ok=True)
+				iterations.append(self.iteration(project_dir, cache_dir, output_dir))
+		finally:
+			shutil.rmtree(work_dir, ignore_errors=True)
+		return {
+			'project': {'files': self.project.file_count, 'file_size': self.project.file_size, 'bytes': project_bytes},
+			'iterations': iterations,
+			'stages': self.summarize(iterations),
+		}
+
+	def summarize(self, iterations):
+		stages = {}
+		for stage in self.STAGES:
+			samples = [iteration[stage] for iteration in iterations]
+			stages[stage] = {
+				'wall': statistics.median(sample['wall'] for sample in samples),
+				'cpu': statistics.median(sample['cpu'] for sample in samples),
+				'peak_rss': max(sample['peak_rss'] for sample in samples),
+				'requests': statistics.median(sample['requests'] for sample in samples),
+			}
+		return stages
+
+class IResultStore(ABC):
+	@abstractmethod
+	def append(self, record):
+		pass
+
+	@abstractmethod
+	def baseline(self, record, label=None):
+		pass
+
+class ResultStore(IResultStore):
+	def __init__(self, path):
+		self.path = path
+
+	def load(self):
+		try:
+			with open(self.path, 'r') as results_file:
+				return [json.loads(line) for line in results_file if line.strip()]
+		except OSError:
+			return []
+
+	def append(self, record):
+		os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+		with open(self.path, 'a') as results_file:
+			results_file.write(json.dumps(record) + '\n')
+
+	def baseline(self, record, label=None):
+		# Only runs over the same project shape and settings are comparable
+		for previous in reversed(self.load()):
+			if previous['config'] != record['config']:
+				continue
+			if label is None or previous['label'] == label:
+				return previous
+		return None
+
+def git_revision():
+	try:
+		return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def print_report(console, record, baseline, threshold):
+	table = Table(title=f"{record['label']} ({record['project']['files']} files, {record['project']['bytes'] / 1e6:.1f} MB)", header_style="bold magenta")
+	for column in ('Stage', 'Wall (s)', 'CPU (s)', 'Peak RSS (MB)', 'Requests'):
+		table.add_column(column, justify='right' if column != 'Stage' else 'left')
+	if baseline is not None:
+		table.add_column(f"Wall vs {baseline['label']}", justify='right')
+
+	regressions = []
+	for stage, stats in record['stages'].items():
+		row = [stage, f"{stats['wall']:.3f}", f"{stats['cpu']:.3f}", f"{stats['peak_rss'] / 1e6:.1f}", f"{stats['requests']:g}"]
+		if baseline is not None:
+			previous = baseline['stages'][stage]['wall']
+			change = (stats['wall'] - previous) / previous if previous else 0.0
+			style = 'red' if change > threshold else 'green' if change < -threshold else 'dim'
+			row.append(f'[{style}]{change:+.1%}[/{style}]')
+			if change > threshold:
+				regressions.append(stage)
+		table.add_row(*row)
+	console.print(table)
+	return regressions
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Benchmark the zip, upload, message, run and download pipeline against the mock Assistants API')
+	parser.add_argument('--size', choices=sorted(SyntheticProject.SIZES), default='small')
+	parser.add_argument('--files', type=int, help='override the number of files in the synthetic project')
+	parser.add_argument('--file-size', type=int, help='override the average file size in bytes')
+	parser.add_argument('--iterations', type=int, default=3)
+	parser.add_argument('--warm', action='store_true', help='share caches between iterations')
+	parser.add_argument('--latency', type=float, default=0.0, help='mock server latency per request, in seconds')
+	parser.add_argument('--reply-bytes', type=int, default=1024 * 1024, help='size of the file the mock run produces')
+	parser.add_argument('--server-url', help='use an already running mock server instead of starting one')
+	parser.add_argument('--in-process', action='store_true', help='run the mock server in this process; its CPU time and memory are then counted in the results')
+	parser.add_argument('--results', default=os.path.join('benchmarks', 'results.jsonl'))
+	parser.add_argument('--label', default=None, help='name for this run, defaults to the git revision')
+	parser.add_argument('--baseline', default=None, help='label of the run to compare with, defaults to the latest comparable one')
+	parser.add_argument('--threshold', type=float, default=0.10, help='relative wall time increase reported as a regression')
+	parser.add_argument('--no-save', action='store_true')
+	parser.add_argument('--fail-on-regression', action='store_true')
+	parser.add_argument('--seed', type=int, default=0)
+	args = parser.parse_args()
+
+	project = SyntheticProject.preset(args.size, args.seed)
+	project.file_count = args.files or project.file_count
+	project.file_size = args.file_size or project.file_size
+
+	server = None
+	base_url = args.server_url
+	if base_url is None and args.in_process:
+		store = MockStore(RunScript(reply_file=random.Random(args.seed).randbytes(args.reply_bytes)))
+		server = MockAssistantsServer(MockAssistantsAPI(store, FaultInjector(latency=args.latency, seed=args.seed))).start()
+		base_url = server.base_url
+	elif base_url is None:
+		server = MockServerProcess(args.latency, args.reply_bytes, args.seed).start()
+		base_url = server.base_url
+	try:
+		result = PipelineBenchmark(project, base_url, args.iterations, warm=args.warm).run()
+	finally:
+		if server is not None:
+			server.stop()
+
+	record = dict(
+		result,
+		label=args.label or git_revision() or datetime.now().strftime('%Y%m%d%H%M%S'),
+		created_at=datetime.now().isoformat(timespec='seconds'),
+		config={
+			'files': project.file_count,
+			'file_size': project.file_size,
+			'seed': args.seed,
+			'iterations': args.iterations,
+			'warm': args.warm,
+			'latency': args.latency,
+			'reply_bytes': args.reply_bytes,
+			'server': 'external' if args.server_url else 'in-process' if args.in_process else 'subprocess',
+		},
+	)
+	result_store = ResultStore(args.results)
+	baseline = result_store.baseline(record, args.baseline)
+	regressions = print_report(Console(), record, baseline, args.threshold)
+	if not args.no_save:
+		result_store.append(record)
+	if regressions and args.fail_on_regression:
+		raise SystemExit(f"Wall time regressed by more than {args.threshold:.0%} in: {', '.join(regressions)}")
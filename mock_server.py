@@ -0,0 +1,839 @@
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.parser import BytesParser
+from email import policy
+from urllib.parse import urlsplit, parse_qs
+from collections import Counter
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+def new_id(prefix):
+	return f'{prefix}_{uuid.uuid4().hex[:24]}'
+
+def now():
+	return int(time.time())
+
+class MockError(Exception):
+	def __init__(self, status, message, error_type='invalid_request_error', headers=None):
+		super().__init__(message)
+		self.status = status
+		self.message = message
+		self.error_type = error_type
+		self.headers = headers or {}
+
+	def body(self):
+		return {'error': {'message': self.message, 'type': self.error_type, 'param': None, 'code': None}}
+
+class IFaultInjector(ABC):
+	@abstractmethod
+	def before(self, route):
+		pass
+
+	@abstractmethod
+	def headers(self):
+		pass
+
+class FaultInjector(IFaultInjector):
+	def __init__(self, latency=0.0, jitter=0.0, latencies=None, failure_rate=0.0, rate_limit_rate=0.0, requests_per_minute=None, retry_after=0.5, seed=None):
+		self.latency = latency
+		self.jitter = jitter
+		self.latencies = latencies or {}
+		self.failure_rate = failure_rate
+		self.rate_limit_rate = rate_limit_rate
+		self.requests_per_minute = requests_per_minute
+		self.retry_after = retry_after
+		self.random = random.Random(seed)
+		self.lock = threading.Lock()
+		self.tokens = requests_per_minute
+		self.refilled = time.monotonic()
+		self.scripted = []
+
+	def inject(self, status, count=1, route=None):
+		# Fail the next `count` requests (to `route`, if given) with `status`
+		with self.lock:
+			self.scripted.append({'status': status, 'count': count, 'route': route})
+
+	def sleep(self, route):
+		delay = self.latencies.get(route, self.latency)
+		if self.jitter:
+			delay += self.random.uniform(0, self.jitter)
+		if delay > 0:
+			time.sleep(delay)
+
+	def take_scripted(self, route):
+		for entry in self.scripted:
+			if entry['route'] in (None, route):
+				entry['count'] -= 1
+				if entry['count'] <= 0:
+					self.scripted.remove(entry)
+				return entry['status']
+		return None
+
+	def rate_limit_error(self, retry_after=None):
+		retry_after = self.retry_after if retry_after is None else retry_after
+		return MockError(429, 'Rate limit reached for requests', 'requests', {'retry-after-ms': str(int(retry_after * 1000))})
+
+	def refill(self):
+		# The budget drips back at requests_per_minute / 60 per second, capped at one minute's worth
+		current = time.monotonic()
+		rate = self.requests_per_minute / 60
+		self.tokens = min(self.requests_per_minute, self.tokens + (current - self.refilled) * rate)
+		self.refilled = current
+		return rate
+
+	def before(self, route):
+		self.sleep(route)
+		with self.lock:
+			status = self.take_scripted(route)
+			if status == 429:
+				raise self.rate_limit_error()
+			if status is not None:
+				raise MockError(status, f'Injected {status} failure', 'server_error')
+
+			if self.requests_per_minute is not None:
+				rate = self.refill()
+				if self.tokens < 1:
+					raise self.rate_limit_error((1 - self.tokens) / rate if rate else None)
+				self.tokens -= 1
+
+			if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+				raise self.rate_limit_error()
+			if self.failure_rate and self.random.random() < self.failure_rate:
+				raise MockError(500, 'Injected server failure', 'server_error')
+
+	def headers(self):
+		if self.requests_per_minute is None:
+			return {}
+		with self.lock:
+			rate = self.refill()
+			remaining = int(self.tokens)
+			reset = (self.requests_per_minute - self.tokens) / rate if rate else 0
+		return {
+			'x-ratelimit-limit-requests': str(self.requests_per_minute),
+			'x-ratelimit-remaining-requests': str(remaining),
+			'x-ratelimit-reset-requests': f'{max(0.0, reset):.3f}s',
+		}
+
+class IRunScript(ABC):
+	@abstractmethod
+	def step(self, index):
+		pass
+
+class RunScript(IRunScript):
+	# Each step is a status, or a dict for requires_action carrying the tool calls to request
+	DEFAULT_STEPS = ('queued', 'in_progress', 'completed')
+
+	def __init__(self, steps=DEFAULT_STEPS, reply_text='Done.', reply_file=None, reply_file_name='output.zip', step_seconds=None):
+		self.steps = [step if isinstance(step, dict) else {'status': step} for step in steps]
+		self.reply_text = reply_text
+		self.reply_file = reply_file
+		self.reply_file_name = reply_file_name
+		self.step_seconds = step_seconds
+
+	def step(self, index):
+		return self.steps[min(index, len(self.steps) - 1)]
+
+	def is_last(self, index):
+		return index >= len(self.steps) - 1
+
+class MockStore:
+	TERMINAL_STATUSES = ('completed', 'failed', 'cancelled', 'expired')
+
+	def __init__(self, run_script=None):
+		self.run_script = RunScript() if run_script is None else run_script
+		self.lock = threading.RLock()
+		self.assistants = {}
+		self.threads = {}
+		self.messages = {}
+		self.runs = {}
+		self.steps = {}
+		self.files = {}
+		self.contents = {}
+		self.uploads = {}
+		self.parts = {}
+		self.progress = {}
+
+	@staticmethod
+	def get(collection, object_id, kind):
+		if object_id not in collection:
+			raise MockError(404, f"No {kind} found with id '{object_id}'.")
+		return collection[object_id]
+
+	@staticmethod
+	def page(items, query):
+		# Items are stored oldest first, which is what order=asc returns
+		order = query.get('order', 'desc')
+		limit = int(query.get('limit', 20))
+		items = list(items) if order == 'asc' else list(reversed(items))
+		ids = [item['id'] for item in items]
+		if query.get('after') in ids:
+			items = items[ids.index(query['after']) + 1:]
+		elif query.get('before') in ids:
+			items = items[:ids.index(query['before'])]
+		data = items[:limit]
+		return {
+			'object': 'list',
+			'data': data,
+			'first_id': data[0]['id'] if data else None,
+			'last_id': data[-1]['id'] if data else None,
+			'has_more': len(items) > limit,
+		}
+
+	def add_assistant(self, assistant_id=None, **fields):
+		assistant = {
+			'id': assistant_id or new_id('asst'),
+			'object': 'assistant',
+			'created_at': now(),
+			'name': fields.get('name'),
+			'description': fields.get('description'),
+			'model': fields.get('model', 'gpt-4-turbo-preview'),
+			'instructions': fields.get('instructions'),
+			'tools': fields.get('tools', []),
+			'file_ids': fields.get('file_ids', []),
+			'metadata': fields.get('metadata', {}),
+		}
+		with self.lock:
+			self.assistants[assistant['id']] = assistant
+		return assistant
+
+	def update_assistant(self, assistant_id, fields):
+		with self.lock:
+			assistant = self.get(self.assistants, assistant_id, 'assistant')
+			for file_id in fields.get('file_ids', []):
+				self.get(self.files, file_id, 'file')
+			assistant.update({key: value for key, value in fields.items() if key in assistant and key not in ('id', 'object', 'created_at')})
+			return assistant
+
+	def add_file(self, filename, purpose, data):
+		file_object = {
+			'id': new_id('file'),
+			'object': 'file',
+			'bytes': len(data),
+			'created_at': now(),
+			'filename': filename,
+			'purpose': purpose,
+			'status': 'processed',
+			'status_details': None,
+		}
+		with self.lock:
+			self.files[file_object['id']] = file_object
+			self.contents[file_object['id']] = data
+		return file_object
+
+	def add_upload(self, fields):
+		upload = {
+			'id': new_id('upload'),
+			'object': 'upload',
+			'bytes': fields['bytes'],
+			'created_at': now(),
+			'expires_at': now() + 3600,
+			'filename': fields['filename'],
+			'purpose': fields['purpose'],
+			'status': 'pending',
+			'file': None,
+		}
+		with self.lock:
+			self.uploads[upload['id']] = upload
+			self.parts[upload['id']] = {}
+		return upload
+
+	def add_part(self, upload_id, data):
+		with self.lock:
+			upload = self.get(self.uploads, upload_id, 'upload')
+			if upload['status'] != 'pending':
+				raise MockError(400, f"Upload '{upload_id}' is already {upload['status']}.")
+			part = {'id': new_id('part'), 'object': 'upload.part', 'created_at': now(), 'upload_id': upload_id}
+			self.parts[upload_id][part['id']] = data
+			return part
+
+	def complete_upload(self, upload_id, part_ids):
+		with self.lock:
+			upload = self.get(self.uploads, upload_id, 'upload')
+			parts = self.parts[upload_id]
+			missing = [part_id for part_id in part_ids if part_id not in parts]
+			if missing:
+				raise MockError(400, f"Unknown part ids: {', '.join(missing)}")
+			data = b''.join(parts[part_id] for part_id in part_ids)
+			if len(data) != upload['bytes']:
+				raise MockError(400, f"Upload expected {upload['bytes']} bytes but parts total {len(data)}.")
+			upload['file'] = self.add_file(upload['filename'], upload['purpose'], data)
+			upload['status'] = 'completed'
+			return upload
+
+	def add_thread(self, fields=None):
+		fields = fields or {}
+		thread = {'id': new_id('thread'), 'object': 'thread', 'created_at': now(), 'metadata': fields.get('metadata', {})}
+		with self.lock:
+			self.threads[thread['id']] = thread
+			self.messages[thread['id']] = []
+			for message in fields.get('messages', []):
+				self.add_message(thread['id'], message)
+		return thread
+
+	def add_message(self, thread_id, fields, assistant_id=None, run_id=None, annotations=None):
+		with self.lock:
+			self.get(self.threads, thread_id, 'thread')
+			for file_id in fields.get('file_ids', []):
+				self.get(self.files, file_id, 'file')
+			message = {
+				'id': new_id('msg'),
+				'object': 'thread.message',
+				'created_at': now(),
+				'thread_id': thread_id,
+				'status': 'completed',
+				'role': fields.get('role', 'user'),
+				'content': [{'type': 'text', 'text': {'value': fields.get('content', ''), 'annotations': annotations or []}}],
+				'file_ids': fields.get('file_ids', []),
+				'assistant_id': assistant_id,
+				'run_id': run_id,
+				'metadata': fields.get('metadata', {}),
+			}
+			self.messages[thread_id].append(message)
+			return message
+
+	def find_message(self, thread_id, message_id):
+		self.get(self.threads, thread_id, 'thread')
+		for message in self.messages[thread_id]:
+			if message['id'] == message_id:
+				return message
+		raise MockError(404, f"No message found with id '{message_id}'.")
+
+	def add_run(self, thread_id, fields):
+		with self.lock:
+			self.get(self.threads, thread_id, 'thread')
+			assistant = self.get(self.assistants, fields.get('assistant_id'), 'assistant')
+			for run in self.runs.values():
+				if run['thread_id'] == thread_id and run['status'] not in self.TERMINAL_STATUSES:
+					raise MockError(400, f"Thread {thread_id} already has an active run {run['id']}.")
+			run = {
+				'id': new_id('run'),
+				'object': 'thread.run',
+				'created_at': now(),
+				'thread_id': thread_id,
+				'assistant_id': assistant['id'],
+				'status': self.run_script.step(0)['status'],
+				'required_action': None,
+				'last_error': None,
+				'expires_at': now() + 600,
+				'started_at': None,
+				'cancelled_at': None,
+				'failed_at': None,
+				'completed_at': None,
+				'model': fields.get('model') or assistant['model'],
+				'instructions': fields.get('instructions') or assistant['instructions'],
+				'tools': fields.get('tools') or assistant['tools'],
+				'file_ids': assistant['file_ids'],
+				'metadata': fields.get('metadata', {}),
+				'usage': None,
+			}
+			self.runs[run['id']] = run
+			self.steps[run['id']] = []
+			self.progress[run['id']] = {'index': 0, 'changed_at': time.monotonic()}
+			self.enter(run, self.run_script.step(0))
+			return run
+
+	def find_run(self, thread_id, run_id):
+		run = self.get(self.runs, run_id, 'run')
+		if run['thread_id'] != thread_id:
+			raise MockError(404, f"No run found with id '{run_id}'.")
+		return run
+
+	def add_step(self, run, step_type, step_details):
+		step = {
+			'id': new_id('step'),
+			'object': 'thread.run.step',
+			'created_at': now(),
+			'run_id': run['id'],
+			'assistant_id': run['assistant_id'],
+			'thread_id': run['thread_id'],
+			'type': step_type,
+			'status': 'completed',
+			'step_details': step_details,
+			'last_error': None,
+			'expired_at': None,
+			'cancelled_at': None,
+			'failed_at': None,
+			'completed_at': now(),
+			'metadata': {},
+			'usage': None,
+		}
+		self.steps[run['id']].append(step)
+		return step
+
+	def reply(self, run):
+		script = self.run_script
+		annotations = []
+		text = script.reply_text
+		if script.reply_file is not None:
+			file_object = self.add_file(script.reply_file_name, 'assistants_output', script.reply_file)
+			link = f'sandbox:/mnt/data/{script.reply_file_name}'
+			text = f'{text} [{script.reply_file_name}]({link})'
+			start = text.index(link)
+			annotations.append({
+				'type': 'file_path',
+				'text': link,
+				'start_index': start,
+				'end_index': start + len(link),
+				'file_path': {'file_id': file_object['id']},
+			})
+		message = self.add_message(run['thread_id'], {'role': 'assistant', 'content': text}, run['assistant_id'], run['id'], annotations)
+		step = self.add_step(run, 'message_creation', {'type': 'message_creation', 'message_creation': {'message_id': message['id']}})
+		return message, step
+
+	def enter(self, run, step):
+		# Apply the side effects of moving `run` into the scripted `step`
+		status = step['status']
+		run['status'] = status
+		run['required_action'] = None
+		if status == 'in_progress' and run['started_at'] is None:
+			run['started_at'] = now()
+		elif status == 'requires_action':
+			tool_calls = [
+				{'id': new_id('call'), 'type': 'function', 'function': {'name': tool_call['name'], 'arguments': json.dumps(tool_call.get('arguments', {}))}}
+				for tool_call in step.get('tool_calls', [])
+			]
+			run['required_action'] = {'type': 'submit_tool_outputs', 'submit_tool_outputs': {'tool_calls': tool_calls}}
+		elif status == 'completed':
+			run['completed_at'] = now()
+			run['usage'] = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+			return self.reply(run)
+		elif status == 'failed':
+			run['failed_at'] = now()
+			run['last_error'] = step.get('last_error', {'code': 'server_error', 'message': 'Scripted failure'})
+		elif status == 'cancelled':
+			run['cancelled_at'] = now()
+		return None
+
+	def advance(self, run, force=False):
+		# Polls move a run along its script: one step per poll, or one per step_seconds when set
+		progress = self.progress[run['id']]
+		moved = []
+		while run['status'] not in self.TERMINAL_STATUSES and not self.run_script.is_last(progress['index']):
+			if run['status'] == 'requires_action' and not force:
+				break
+			step_seconds = self.run_script.step_seconds
+			if step_seconds is not None and time.monotonic() - progress['changed_at'] < step_seconds and not force:
+				break
+			progress['index'] += 1
+			progress['changed_at'] = time.monotonic()
+			step = self.run_script.step(progress['index'])
+			moved.append((step, self.enter(run, step)))
+			force = False
+			if step_seconds is None:
+				break
+		return moved
+
+	def poll_run(self, thread_id, run_id):
+		with self.lock:
+			run = self.find_run(thread_id, run_id)
+			self.advance(run)
+			return run
+
+	def submit_tool_outputs(self, thread_id, run_id, tool_outputs):
+		with self.lock:
+			run = self.find_run(thread_id, run_id)
+			if run['status'] != 'requires_action':
+				raise MockError(400, f"Runs in status \"{run['status']}\" do not accept tool outputs.")
+			expected = {tool_call['id'] for tool_call in run['required_action']['submit_tool_outputs']['tool_calls']}
+			submitted = {tool_output['tool_call_id'] for tool_output in tool_outputs}
+			if expected != submitted:
+				raise MockError(400, f"Expected tool outputs for call ids {sorted(expected)}, got {sorted(submitted)}.")
+			self.add_step(run, 'tool_calls', {
+				'type': 'tool_calls',
+				'tool_calls': [
+					dict(tool_call, function=dict(tool_call['function'], output=output['output']))
+					for tool_call, output in zip(run['required_action']['submit_tool_outputs']['tool_calls'], tool_outputs)
+				],
+			})
+			self.advance(run, force=True)
+			return run
+
+	def cancel_run(self, thread_id, run_id):
+		with self.lock:
+			run = self.find_run(thread_id, run_id)
+			if run['status'] in self.TERMINAL_STATUSES:
+				raise MockError(400, f"Cannot cancel run with status '{run['status']}'.")
+			run['status'] = 'cancelled'
+			run['cancelled_at'] = now()
+			run['required_action'] = None
+			return run
+
+class MockAssistantsAPI:
+	ROUTES = [
+		('POST', r'/assistants', 'assistants.create'),
+		('GET', r'/assistants', 'assistants.list'),
+		('GET', r'/assistants/(?P<assistant_id>[^/]+)', 'assistants.retrieve'),
+		('POST', r'/assistants/(?P<assistant_id>[^/]+)', 'assistants.update'),
+		('POST', r'/threads', 'threads.create'),
+		('POST', r'/threads/runs', 'threads.create_and_run'),
+		('GET', r'/threads/(?P<thread_id>[^/]+)', 'threads.retrieve'),
+		('POST', r'/threads/(?P<thread_id>[^/]+)/messages', 'messages.create'),
+		('GET', r'/threads/(?P<thread_id>[^/]+)/messages', 'messages.list'),
+		('GET', r'/threads/(?P<thread_id>[^/]+)/messages/(?P<message_id>[^/]+)', 'messages.retrieve'),
+		('GET', r'/threads/(?P<thread_id>[^/]+)/messages/(?P<message_id>[^/]+)/files', 'messages.files.list'),
+		('GET', r'/threads/(?P<thread_id>[^/]+)/messages/(?P<message_id>[^/]+)/files/(?P<file_id>[^/]+)', 'messages.files.retrieve'),
+		('POST', r'/threads/(?P<thread_id>[^/]+)/runs', 'runs.create'),
+		('GET', r'/threads/(?P<thread_id>[^/]+)/runs', 'runs.list'),
+		('GET', r'/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)', 'runs.retrieve'),
+		('POST', r'/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/submit_tool_outputs', 'runs.submit_tool_outputs'),
+		('POST', r'/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/cancel', 'runs.cancel'),
+		('GET', r'/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/steps', 'runs.steps.list'),
+		('POST', r'/files', 'files.create'),
+		('GET', r'/files', 'files.list'),
+		('GET', r'/files/(?P<file_id>[^/]+)', 'files.retrieve'),
+		('GET', r'/files/(?P<file_id>[^/]+)/content', 'files.content'),
+		('POST', r'/uploads', 'uploads.create'),
+		('POST', r'/uploads/(?P<upload_id>[^/]+)/parts', 'uploads.parts.create'),
+		('POST', r'/uploads/(?P<upload_id>[^/]+)/complete', 'uploads.complete'),
+	]
+
+	def __init__(self, store=None, fault_injector=None, stream_interval=0.0):
+		self.store = MockStore() if store is None else store
+		self.fault_injector = FaultInjector() if fault_injector is None else fault_injector
+		self.stream_interval = stream_interval
+		self.routes = [(method, re.compile(f'(?:/v1)?{pattern}$'), name) for method, pattern, name in self.ROUTES]
+		self.request_counts = Counter()
+		self.counts_lock = threading.Lock()
+
+	def match(self, method, path):
+		for route_method, pattern, name in self.routes:
+			match = pattern.match(path)
+			if match and route_method == method:
+				return name, match.groupdict()
+		raise MockError(404, f'Unknown endpoint {method} {path}')
+
+	@staticmethod
+	def parse_multipart(content_type, body):
+		message = BytesParser(policy=policy.default).parsebytes(f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+		fields = {}
+		for part in message.iter_parts():
+			name = part.get_param('name', header='content-disposition')
+			fields[name] = (part.get_filename(), part.get_payload(decode=True))
+		return fields
+
+	def handle(self, method, target, headers, body):
+		# Returns (status, headers, payload); payload is a dict, bytes, or an iterator of SSE chunks
+		url = urlsplit(target)
+		query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+		try:
+			name, params = self.match(method, url.path)
+			with self.counts_lock:
+				self.request_counts[name] += 1
+			self.fault_injector.before(name)
+			if headers.get('content-type', '').startswith('multipart/form-data'):
+				fields = self.parse_multipart(headers['content-type'], body)
+			else:
+				fields = json.loads(body) if body else {}
+			status, extra_headers, payload = 200, {}, getattr(self, name.replace('.', '_'))(fields, query, headers, **params)
+			if isinstance(payload, tuple):
+				status, extra_headers, payload = payload
+		except MockError as error:
+			status, extra_headers, payload = error.status, error.headers, error.body()
+		except (ValueError, KeyError) as error:
+			# Malformed bodies and missing fields get an API error, not a dropped connection the SDK would retry
+			status, extra_headers, payload = 400, {}, MockError(400, f'Invalid request: {type(error).__name__}: {error}').body()
+		except Exception as error:
+			status, extra_headers, payload = 500, {}, MockError(500, f'{type(error).__name__}: {error}', 'server_error').body()
+		return status, dict(self.fault_injector.headers(), **extra_headers), payload
+
+	def assistants_create(self, fields, query, headers):
+		return self.store.add_assistant(**fields)
+
+	def assistants_list(self, fields, query, headers):
+		return self.store.page(self.store.assistants.values(), query)
+
+	def assistants_retrieve(self, fields, query, headers, assistant_id):
+		return self.store.get(self.store.assistants, assistant_id, 'assistant')
+
+	def assistants_update(self, fields, query, headers, assistant_id):
+		return self.store.update_assistant(assistant_id, fields)
+
+	def threads_create(self, fields, query, headers):
+		return self.store.add_thread(fields)
+
+	def threads_create_and_run(self, fields, query, headers):
+		thread = self.store.add_thread(fields.get('thread'))
+		return self.start_run(thread['id'], fields)
+
+	def threads_retrieve(self, fields, query, headers, thread_id):
+		return self.store.get(self.store.threads, thread_id, 'thread')
+
+	def messages_create(self, fields, query, headers, thread_id):
+		return self.store.add_message(thread_id, fields)
+
+	def messages_list(self, fields, query, headers, thread_id):
+		self.store.get(self.store.threads, thread_id, 'thread')
+		return self.store.page(self.store.messages[thread_id], query)
+
+	def messages_retrieve(self, fields, query, headers, thread_id, message_id):
+		return self.store.find_message(thread_id, message_id)
+
+	def message_file(self, message, file_id):
+		return {'id': file_id, 'object': 'thread.message.file', 'created_at': message['created_at'], 'message_id': message['id']}
+
+	def messages_files_list(self, fields, query, headers, thread_id, message_id):
+		message = self.store.find_message(thread_id, message_id)
+		return self.store.page([self.message_file(message, file_id) for file_id in message['file_ids']], query)
+
+	def messages_files_retrieve(self, fields, query, headers, thread_id, message_id, file_id):
+		message = self.store.find_message(thread_id, message_id)
+		if file_id not in message['file_ids']:
+			raise MockError(404, f"No file found with id '{file_id}'.")
+		return self.message_file(message, file_id)
+
+	def start_run(self, thread_id, fields):
+		run = self.store.add_run(thread_id, fields)
+		if fields.get('stream'):
+			return 200, {'content-type': 'text/event-stream'}, self.stream_run(run)
+		return run
+
+	def runs_create(self, fields, query, headers, thread_id):
+		return self.start_run(thread_id, fields)
+
+	def runs_list(self, fields, query, headers, thread_id):
+		self.store.get(self.store.threads, thread_id, 'thread')
+		with self.store.lock:
+			runs = [run for run in self.store.runs.values() if run['thread_id'] == thread_id]
+			for run in runs:
+				self.store.advance(run)
+		return self.store.page(runs, query)
+
+	def runs_retrieve(self, fields, query, headers, thread_id, run_id):
+		return self.store.poll_run(thread_id, run_id)
+
+	def runs_submit_tool_outputs(self, fields, query, headers, thread_id, run_id):
+		return self.store.submit_tool_outputs(thread_id, run_id, fields.get('tool_outputs', []))
+
+	def runs_cancel(self, fields, query, headers, thread_id, run_id):
+		return self.store.cancel_run(thread_id, run_id)
+
+	def runs_steps_list(self, fields, query, headers, thread_id, run_id):
+		self.store.find_run(thread_id, run_id)
+		return self.store.page(self.store.steps[run_id], query)
+
+	def files_create(self, fields, query, headers):
+		filename, data = fields['file']
+		return self.store.add_file(filename, fields['purpose'][1].decode(), data)
+
+	def files_list(self, fields, query, headers):
+		files = [file_object for file_object in self.store.files.values() if query.get('purpose') in (None, file_object['purpose'])]
+		return self.store.page(files, dict(query, limit=len(files) or 1))
+
+	def files_retrieve(self, fields, query, headers, file_id):
+		return self.store.get(self.store.files, file_id, 'file')
+
+	def files_content(self, fields, query, headers, file_id):
+		self.store.get(self.store.files, file_id, 'file')
+		data = self.store.contents[file_id]
+		match = re.match(r'bytes=(\d+)-$', headers.get('range', ''))
+		if match is None:
+			return 200, {'content-type': 'application/octet-stream'}, data
+		offset = int(match.group(1))
+		if offset >= len(data):
+			raise MockError(416, 'Requested range not satisfiable', headers={'content-range': f'bytes */{len(data)}'})
+		return 206, {'content-type': 'application/octet-stream', 'content-range': f'bytes {offset}-{len(data) - 1}/{len(data)}'}, data[offset:]
+
+	def uploads_create(self, fields, query, headers):
+		return self.store.add_upload(fields)
+
+	def uploads_parts_create(self, fields, query, headers, upload_id):
+		return self.store.add_part(upload_id, fields['data'][1])
+
+	def uploads_complete(self, fields, query, headers, upload_id):
+		return self.store.complete_upload(upload_id, fields.get('part_ids', []))
+
+	@staticmethod
+	def event(name, data):
+		return f'event: {name}\ndata: {json.dumps(data)}\n\n'.encode()
+
+	def stream_run(self, run):
+		# Replays the whole script as server-sent events, stopping early when tool outputs are needed
+		yield self.event('thread.run.created', dict(run))
+		yield self.event(f"thread.run.{run['status']}", dict(run))
+		while True:
+			time.sleep(self.stream_interval)
+			with self.store.lock:
+				moved = self.store.advance(run, force=run['status'] != 'requires_action')
+				snapshot = dict(run)
+			if not moved:
+				break
+			for step, reply in moved:
+				if reply is not None:
+					yield from self.stream_reply(*reply)
+				yield self.event(f"thread.run.{step['status']}", snapshot)
+		yield b'event: done\ndata: [DONE]\n\n'
+
+	def stream_reply(self, message, step):
+		in_progress_step = dict(step, status='in_progress', completed_at=None)
+		yield self.event('thread.run.step.created', in_progress_step)
+		yield self.event('thread.message.created', dict(message, status='in_progress', content=[]))
+		text = message['content'][0]['text']
+		for index, word in enumerate(re.findall(r'\S+\s*', text['value'])):
+			yield self.event('thread.message.delta', {
+				'id': message['id'],
+				'object': 'thread.message.delta',
+				'delta': {'content': [{'index': 0, 'type': 'text', 'text': {'value': word, 'annotations': [] if index else text['annotations']}}]},
+			})
+			time.sleep(self.stream_interval)
+		yield self.event('thread.message.completed', message)
+		yield self.event('thread.run.step.completed', step)
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+	# Headers and body go out in separate writes; without this, delayed ACKs add ~40ms per response
+	disable_nagle_algorithm = True
+
+	def read_exactly(self, size):
+		data = self.rfile.read(size)
+		if len(data) < size:
+			raise ConnectionError('client closed the connection before the request body was complete')
+		return data
+
+	def read_line(self):
+		line = self.rfile.readline()
+		if not line.endswith(b'\n'):
+			raise ConnectionError('client closed the connection before the request body was complete')
+		return line
+
+	def read_body(self):
+		if 'chunked' not in self.headers.get('transfer-encoding', '').lower():
+			return self.read_exactly(int(self.headers.get('content-length') or 0))
+
+		# Streamed uploads have no length up front and arrive as size-prefixed chunks;
+		# an upload aborted halfway must not be taken for a complete, shorter one
+		chunks = []
+		while True:
+			size = int(self.read_line().split(b';')[0].strip() or b'0', 16)
+			if size == 0:
+				while self.read_line() not in (b'\r\n', b'\n'):
+					pass
+				return b''.join(chunks)
+			chunks.append(self.read_exactly(size))
+			self.read_line()
+
+	def dispatch(self):
+		try:
+			body = self.read_body()
+		except ConnectionError:
+			self.close_connection = True
+			return
+		headers = {key.lower(): value for key, value in self.headers.items()}
+		status, response_headers, payload = self.server.api.handle(self.command, self.path, headers, body)
+		self.send_response(status)
+		for key, value in response_headers.items():
+			if key != 'content-type':
+				self.send_header(key, value)
+
+		if isinstance(payload, (dict, list)):
+			payload = json.dumps(payload).encode()
+			response_headers.setdefault('content-type', 'application/json')
+		if isinstance(payload, bytes):
+			self.send_header('content-type', response_headers['content-type'])
+			self.send_header('content-length', str(len(payload)))
+			self.end_headers()
+			self.wfile.write(payload)
+			return
+
+		# Streams have no length up front, so they end by closing the connection
+		self.send_header('content-type', response_headers['content-type'])
+		self.send_header('cache-control', 'no-cache')
+		self.send_header('connection', 'close')
+		self.end_headers()
+		self.close_connection = True
+		for chunk in payload:
+			self.wfile.write(chunk)
+			self.wfile.flush()
+
+	do_GET = dispatch
+	do_POST = dispatch
+
+	def log_message(self, format, *args):
+		if self.server.verbose:
+			super().log_message(format, *args)
+
+class IMockAssistantsServer(ABC):
+	@abstractmethod
+	def start(self):
+		pass
+
+	@abstractmethod
+	def stop(self):
+		pass
+
+class MockAssistantsServer(IMockAssistantsServer):
+	def __init__(self, api=None, host='127.0.0.1', port=0, verbose=False):
+		self.api = MockAssistantsAPI() if api is None else api
+		self.httpd = ThreadingHTTPServer((host, port), MockRequestHandler)
+		self.httpd.daemon_threads = True
+		self.httpd.api = self.api
+		self.httpd.verbose = verbose
+		self.thread = None
+
+	@property
+	def base_url(self):
+		host, port = self.httpd.server_address[:2]
+		return f'http://{host}:{port}/v1'
+
+	@property
+	def store(self):
+		return self.api.store
+
+	@property
+	def request_counts(self):
+		return self.api.request_counts
+
+	def start(self):
+		self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+		self.thread.start()
+		return self
+
+	def stop(self):
+		self.httpd.shutdown()
+		self.httpd.server_close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.stop()
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Local stand-in for the Assistants API endpoints used by assistant_implementation_main.py')
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=8089)
+	parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+	parser.add_argument('--jitter', type=float, default=0.0, help='random extra latency, up to this many seconds')
+	parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of requests answered with a 500')
+	parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of requests answered with a 429')
+	parser.add_argument('--requests-per-minute', type=int, default=None, help='enforce a request budget and send x-ratelimit headers')
+	parser.add_argument('--steps', default=','.join(RunScript.DEFAULT_STEPS), help='comma separated run statuses, e.g. queued,in_progress,completed')
+	parser.add_argument('--step-seconds', type=float, default=None, help='advance runs on a clock instead of once per poll')
+	parser.add_argument('--reply-bytes', type=int, default=0, help='attach a generated file of this size to each run reply')
+	parser.add_argument('--assistant-id', action='append', default=[], help='pre-create an assistant with this id')
+	parser.add_argument('--seed', type=int, default=None)
+	parser.add_argument('--verbose', action='store_true')
+	args = parser.parse_args()
+
+	reply_file = random.Random(args.seed).randbytes(args.reply_bytes) if args.reply_bytes else None
+	store = MockStore(RunScript(args.steps.split(','), reply_file=reply_file, step_seconds=args.step_seconds))
+	for assistant_id in args.assistant_id:
+		store.add_assistant(assistant_id)
+	fault_injector = FaultInjector(
+		latency=args.latency,
+		jitter=args.jitter,
+		failure_rate=args.failure_rate,
+		rate_limit_rate=args.rate_limit_rate,
+		requests_per_minute=args.requests_per_minute,
+		seed=args.seed,
+	)
+	server = MockAssistantsServer(MockAssistantsAPI(store, fault_injector), args.host, args.port, args.verbose)
+	print(f'Serving mock Assistants API at {server.base_url} (set OPENAI_BASE_URL to use it)')
+	try:
+		server.httpd.serve_forever()
+	except KeyboardInterrupt:
+		server.stop()
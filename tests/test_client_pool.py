@@ -0,0 +1,56 @@
+import asyncio
+import openai
+import pytest
+from assistant_implementation_main import ClientPool, MetricsRegistry
+from mock_server import MockAssistantsServer
+
+BASE_URL = 'http://api.example.invalid/v1'
+
+@pytest.fixture
+def proxy(monkeypatch):
+	# The mock server also answers absolute-form requests, so it can stand in for a forward proxy
+	for name in ('HTTP_PROXY', 'HTTPS_PROXY', 'ALL_PROXY', 'NO_PROXY', 'http_proxy', 'https_proxy', 'all_proxy', 'no_proxy'):
+		monkeypatch.delenv(name, raising=False)
+	with MockAssistantsServer() as server:
+		monkeypatch.setenv('HTTP_PROXY', server.base_url[:-len('/v1')])
+		yield server
+
+def test_clients_use_environment_proxies(proxy):
+	metrics = MetricsRegistry()
+	client_pool = ClientPool(metrics=metrics, base_url=BASE_URL, api_key='test', max_retries=0)
+	try:
+		thread = client_pool.client().beta.threads.create()
+	finally:
+		client_pool.close()
+	assert thread.id in proxy.store.threads
+	assert metrics.snapshot()['POST /threads']['requests'] == 1
+
+def test_async_clients_use_environment_proxies(proxy):
+	metrics = MetricsRegistry()
+	client_pool = ClientPool(metrics=metrics, base_url=BASE_URL, api_key='test', max_retries=0)
+
+	async def main():
+		try:
+			return await client_pool.async_client().beta.threads.create()
+		finally:
+			await client_pool.aclose()
+
+	assert asyncio.run(main()).id in proxy.store.threads
+	assert metrics.snapshot()['POST /threads']['requests'] == 1
+
+def test_no_proxy_and_trust_env_are_respected(proxy, monkeypatch):
+	client_pool = ClientPool(base_url=BASE_URL, api_key='test', max_retries=0, trust_env=False)
+	try:
+		with pytest.raises(openai.APIConnectionError):
+			client_pool.client().beta.threads.create()
+	finally:
+		client_pool.close()
+
+	monkeypatch.setenv('NO_PROXY', 'api.example.invalid')
+	client_pool = ClientPool(base_url=BASE_URL, api_key='test', max_retries=0)
+	try:
+		with pytest.raises(openai.APIConnectionError):
+			client_pool.client().beta.threads.create()
+	finally:
+		client_pool.close()
+	assert not proxy.store.threads
@@ -0,0 +1,75 @@
+import os
+import random
+import zipfile
+import pytest
+from assistant_implementation_main import DirectoryManager
+
+def write(path, data):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, 'wb') as file:
+		file.write(data)
+
+@pytest.fixture
+def project(tmp_path):
+	rng = random.Random(0)
+	root = tmp_path / 'project'
+	for index in range(40):
+		directory = root / f'pkg{index % 4}' / f'sub{index % 3}'
+		if index % 5 == 0:
+			# Incompressible members end up stored larger than their deflate input
+			write(str(directory / f'asset{index}.bin'), rng.randbytes(rng.randint(0, 40000)))
+		else:
+			write(str(directory / f'module{index}.py'), (f'def function_{index}():\n\treturn {index}\n' * rng.randint(1, 3000)).encode())
+	write(str(root / 'empty.txt'), b'')
+	write(str(root / 'large.txt'), b'0123456789abcdef' * 200000)
+	return root
+
+def archive_contents(zip_file_name):
+	with zipfile.ZipFile(zip_file_name) as zipf:
+		assert zipf.testzip() is None
+		return {name: zipf.read(name) for name in zipf.namelist()}
+
+def tree_contents(root):
+	contents = {}
+	for file_path, arcname in DirectoryManager.walk_directory(str(root)):
+		with open(file_path, 'rb') as file:
+			contents[arcname] = file.read()
+	return contents
+
+def test_parallel_archive_is_byte_identical_to_serial(project, tmp_path):
+	serial = DirectoryManager.zip_directory(str(project), str(tmp_path / 'serial.zip'), incremental=False, workers=1)
+	parallel = DirectoryManager.zip_directory(str(project), str(tmp_path / 'parallel.zip'), incremental=False, workers=4)
+	with open(serial, 'rb') as serial_file, open(parallel, 'rb') as parallel_file:
+		assert serial_file.read() == parallel_file.read()
+	assert archive_contents(parallel) == tree_contents(project)
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_incremental_rebuild_after_modify_add_and_delete(project, tmp_path, workers):
+	zip_file_name = str(tmp_path / 'project.zip')
+	DirectoryManager.zip_directory(str(project), zip_file_name, workers=workers)
+	assert archive_contents(zip_file_name) == tree_contents(project)
+
+	modified = project / 'pkg1' / 'sub1' / 'module1.py'
+	write(str(modified), b'def changed():\n\treturn True\n')
+	stat = os.stat(modified)
+	os.utime(modified, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+	write(str(project / 'pkg9' / 'added.py'), b'print("added")\n' * 100)
+	os.remove(project / 'pkg2' / 'sub2' / 'module2.py')
+
+	DirectoryManager.zip_directory(str(project), zip_file_name, workers=workers)
+	contents = archive_contents(zip_file_name)
+	assert contents == tree_contents(project)
+	assert contents['pkg1/sub1/module1.py'] == b'def changed():\n\treturn True\n'
+	assert 'pkg9/added.py' in contents
+	assert 'pkg2/sub2/module2.py' not in contents
+
+	# A rebuild that reused members must match a from-scratch archive member for member
+	fresh = DirectoryManager.zip_directory(str(project), str(tmp_path / 'fresh.zip'), incremental=False, workers=workers)
+	assert archive_contents(fresh) == contents
+
+def test_unchanged_tree_leaves_archive_untouched(project, tmp_path):
+	zip_file_name = str(tmp_path / 'project.zip')
+	DirectoryManager.zip_directory(str(project), zip_file_name)
+	before = os.stat(zip_file_name).st_mtime_ns
+	DirectoryManager.zip_directory(str(project), zip_file_name)
+	assert os.stat(zip_file_name).st_mtime_ns == before
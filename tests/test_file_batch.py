@@ -0,0 +1,38 @@
+import openai
+import pytest
+from assistant_implementation_main import ClientPool, FileBatch, FileCache, MetricsRegistry
+from mock_server import MockAssistantsServer
+
+@pytest.fixture
+def server():
+	with MockAssistantsServer() as server:
+		yield server
+
+@pytest.fixture
+def client(server):
+	# The SDK's default of 2 retries stays on, as it is for every pooled client
+	client_pool = ClientPool(metrics=MetricsRegistry(), base_url=server.base_url, api_key='test')
+	yield client_pool.client()
+	client_pool.close()
+
+@pytest.fixture
+def file_cache(tmp_path):
+	return FileCache(str(tmp_path / 'files.sqlite3'))
+
+@pytest.fixture
+def filepath(tmp_path):
+	path = tmp_path / 'notes.txt'
+	path.write_bytes(b'notes\n')
+	return str(path)
+
+def test_each_attempt_is_one_upload(server, client, file_cache, filepath):
+	server.api.fault_injector.inject(500, count=3, route='files.create')
+	file_batch = FileBatch(client, [filepath], 'assistants', max_attempts=4, backoff=0, file_cache=file_cache)
+	assert file_batch.file_ids[0] in server.store.contents
+	assert server.request_counts['files.create'] == 4
+
+def test_gives_up_after_max_attempts(server, client, file_cache, filepath):
+	server.api.fault_injector.inject(500, count=10, route='files.create')
+	with pytest.raises(openai.InternalServerError):
+		FileBatch(client, [filepath], 'assistants', max_attempts=4, backoff=0, file_cache=file_cache)
+	assert server.request_counts['files.create'] == 4
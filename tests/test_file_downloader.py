@@ -0,0 +1,103 @@
+import os
+import pytest
+from assistant_implementation_main import ClientPool, DownloadCache, FileDownloader, MetricsRegistry
+from mock_server import MockAssistantsServer
+
+@pytest.fixture
+def server():
+	with MockAssistantsServer() as server:
+		yield server
+
+@pytest.fixture
+def metrics():
+	return MetricsRegistry()
+
+@pytest.fixture
+def client(server, metrics):
+	client_pool = ClientPool(metrics=metrics, base_url=server.base_url, api_key='test', max_retries=0)
+	yield client_pool.client()
+	client_pool.close()
+
+@pytest.fixture
+def downloader(client, tmp_path):
+	return FileDownloader(client, directory=str(tmp_path / 'downloads'), download_cache=DownloadCache(str(tmp_path / 'blobs')))
+
+def read(path):
+	with open(path, 'rb') as file:
+		return file.read()
+
+def test_same_name_for_different_file_ids_gets_separate_paths(server, downloader):
+	first = server.store.add_file('output.csv', 'assistants_output', b'a,b\n1,2\n' * 1000)
+	second = server.store.add_file('output.csv', 'assistants_output', b'c,d\n3,4\n' * 2000)
+	paths = downloader.download_files([(first['id'], 'output.csv'), (second['id'], 'output.csv')])
+	assert len(set(paths)) == 2
+	assert read(paths[0]) == server.store.contents[first['id']]
+	assert read(paths[1]) == server.store.contents[second['id']]
+
+	# A later batch must not overwrite a name another file id already owns
+	third = server.store.add_file('output.csv', 'assistants_output', b'e,f\n')
+	[third_path] = downloader.download_files([(third['id'], 'output.csv')])
+	assert third_path not in paths
+	assert read(paths[0]) == server.store.contents[first['id']]
+	assert downloader.download_files([(first['id'], 'output.csv')]) == [paths[0]]
+
+def test_extra_names_for_one_file_id_share_the_download(server, downloader):
+	file_object = server.store.add_file('report.txt', 'assistants_output', b'report')
+	paths = downloader.download_files([(file_object['id'], 'report.txt'), (file_object['id'], 'copy.txt'), (file_object['id'], 'report.txt')])
+	assert paths[0] == paths[2] != paths[1]
+	assert server.request_counts['files.content'] == 1
+	assert read(paths[1]) == b'report'
+
+def write_part(downloader, file_id, output_path, data, recorded=None):
+	part_path, state_path = downloader.part_paths(file_id, output_path)
+	os.makedirs(os.path.dirname(part_path), exist_ok=True)
+	with open(part_path, 'wb') as part_file:
+		part_file.write(recorded if recorded is not None else data)
+	downloader.save_part_state(file_id, part_path, state_path)
+	with open(part_path, 'wb') as part_file:
+		part_file.write(data)
+	return part_path, state_path
+
+def test_partial_download_of_another_file_id_is_not_resumed(server, downloader, tmp_path):
+	first = server.store.add_file('out.bin', 'assistants_output', os.urandom(50000))
+	second = server.store.add_file('out.bin', 'assistants_output', os.urandom(50000))
+	output_path = str(tmp_path / 'downloads' / 'out.bin')
+	first_part, first_state = write_part(downloader, first['id'], output_path, server.store.contents[first['id']][:20000])
+	with open(f'{output_path}.part', 'wb') as legacy_part:
+		legacy_part.write(server.store.contents[first['id']][:30000])
+
+	downloader.fetch(second['id'], output_path)
+	assert read(output_path) == server.store.contents[second['id']]
+	assert not any(os.path.exists(path) for path in (first_part, first_state, f'{output_path}.part'))
+
+def test_partial_download_resumes_from_its_verified_offset(server, downloader, metrics, tmp_path):
+	file_object = server.store.add_file('out.bin', 'assistants_output', os.urandom(50000))
+	content = server.store.contents[file_object['id']]
+	output_path = str(tmp_path / 'downloads' / 'out.bin')
+	part_path, state_path = write_part(downloader, file_object['id'], output_path, content[:20000])
+
+	downloader.fetch(file_object['id'], output_path)
+	assert read(output_path) == content
+	assert not os.path.exists(part_path) and not os.path.exists(state_path)
+	assert metrics.snapshot()['GET /files/{file_id}/content']['bytes_received'] == 30000
+
+def test_part_that_changed_since_it_was_recorded_is_fetched_again(server, downloader, tmp_path):
+	file_object = server.store.add_file('out.bin', 'assistants_output', os.urandom(50000))
+	content = server.store.contents[file_object['id']]
+	output_path = str(tmp_path / 'downloads' / 'out.bin')
+	write_part(downloader, file_object['id'], output_path, os.urandom(20000), recorded=content[:20000])
+
+	downloader.fetch(file_object['id'], output_path)
+	assert read(output_path) == content
+
+def test_resumed_download_must_match_a_known_digest(server, downloader, tmp_path):
+	file_object = server.store.add_file('out.bin', 'assistants_output', os.urandom(50000))
+	content = server.store.contents[file_object['id']]
+	output_path = str(tmp_path / 'downloads' / 'out.bin')
+	write_part(downloader, file_object['id'], output_path, content[:20000])
+	with downloader.download_cache.connection:
+		downloader.download_cache.connection.execute('INSERT INTO file_ids (file_id, sha256) VALUES (?, ?)', (file_object['id'], '0' * 64))
+
+	downloader.fetch(file_object['id'], output_path)
+	assert read(output_path) == content
+	assert server.request_counts['files.content'] == 2
@@ -0,0 +1,146 @@
+import os
+import pytest
+from assistant_implementation_main import DirectoryManager, IgnoreRules
+
+def make_tree(root, files):
+	for rel_path, content in files.items():
+		path = os.path.join(root, *rel_path.split('/'))
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path, 'w') as file:
+			file.write(content)
+
+def walk(root, ignore_rules=None):
+	return sorted(rel_path for _, rel_path in DirectoryManager.walk_directory(str(root), ignore_rules))
+
+@pytest.mark.parametrize('patterns, rel_path, is_dir, ignored', [
+	# Blank lines and comments
+	(['', '# *.py'], 'main.py', False, False),
+	# Unanchored patterns match at any depth
+	(['*.log'], 'debug.log', False, True),
+	(['*.log'], 'a/b/debug.log', False, True),
+	(['debug.log'], 'a/debug.log', False, True),
+	# A leading or middle slash anchors the pattern to the base
+	(['/build'], 'build', True, True),
+	(['/build'], 'src/build', True, False),
+	(['doc/frotz'], 'doc/frotz', False, True),
+	(['doc/frotz'], 'a/doc/frotz', False, False),
+	# A trailing slash only matches directories
+	(['logs/'], 'logs', True, True),
+	(['logs/'], 'logs', False, False),
+	(['logs/'], 'a/logs', True, True),
+	# * and ? never cross a slash
+	(['foo/*'], 'foo/bar', False, True),
+	(['foo/*'], 'foo/bar/baz', False, False),
+	(['file?.txt'], 'file1.txt', False, True),
+	(['file?.txt'], 'file10.txt', False, False),
+	(['a?b'], 'a/b', False, False),
+	# Double asterisks
+	(['**/foo'], 'foo', False, True),
+	(['**/foo'], 'x/y/foo', False, True),
+	(['abc/**'], 'abc/x/y', False, True),
+	(['abc/**'], 'abc', True, False),
+	(['a/**/b'], 'a/b', False, True),
+	(['a/**/b'], 'a/x/y/b', False, True),
+	(['a/**/b'], 'x/a/b', False, False),
+	# Character classes, negated classes and ranges
+	(['[abc].txt'], 'b.txt', False, True),
+	(['[abc].txt'], 'd.txt', False, False),
+	(['[!abc].txt'], 'd.txt', False, True),
+	(['[!abc].txt'], 'a.txt', False, False),
+	(['[^abc].txt'], 'd.txt', False, True),
+	(['[0-9].txt'], '7.txt', False, True),
+	(['[0-9].txt'], 'x.txt', False, False),
+	# Escapes and trailing spaces
+	(['\\#notes'], '#notes', False, True),
+	(['\\!important'], '!important', False, True),
+	(['trailing   '], 'trailing', False, True),
+	(['space\\ '], 'space ', False, True),
+	(['space\\ '], 'space', False, False),
+	(['\\*'], '*', False, True),
+	(['\\*'], 'star', False, False),
+	# Negation, where the last matching rule wins
+	(['*.log', '!keep.log'], 'keep.log', False, False),
+	(['*.log', '!keep.log'], 'other.log', False, True),
+	(['!keep.log', '*.log'], 'keep.log', False, True),
+])
+def test_pattern(patterns, rel_path, is_dir, ignored):
+	assert IgnoreRules(patterns).is_ignored(rel_path, is_dir) == ignored
+
+def test_default_patterns_prune_tool_directories(tmp_path):
+	make_tree(tmp_path, {
+		'main.py': '',
+		'.git/HEAD': '',
+		'node_modules/pkg/index.js': '',
+		'src/__pycache__/main.cpython-311.pyc': '',
+		'.venv/bin/python': '',
+		'.DS_Store': '',
+		'src/app.py': '',
+	})
+	assert walk(tmp_path) == ['main.py', 'src/app.py']
+
+def test_files_cannot_be_re_included_under_an_excluded_directory(tmp_path):
+	make_tree(tmp_path, {
+		'.gitignore': 'build/\n!build/keep.txt\n',
+		'build/keep.txt': '',
+		'build/out.o': '',
+	})
+	assert walk(tmp_path) == ['.gitignore']
+
+def test_files_can_be_re_included_when_only_the_contents_are_excluded(tmp_path):
+	make_tree(tmp_path, {
+		'.gitignore': 'build/*\n!build/keep.txt\n',
+		'build/keep.txt': '',
+		'build/out.o': '',
+		'build/nested/deep.txt': '',
+	})
+	assert walk(tmp_path) == ['.gitignore', 'build/keep.txt']
+
+def test_nested_ignore_files_apply_relative_to_their_directory(tmp_path):
+	make_tree(tmp_path, {
+		'.gitignore': '*.tmp\n',
+		'local': '',
+		'a.tmp': '',
+		'sub/.gitignore': '/local\n!important.tmp\n*.cache\n',
+		'sub/local': '',
+		'sub/deeper/local': '',
+		'sub/important.tmp': '',
+		'sub/scratch.tmp': '',
+		'sub/x.cache': '',
+		'x.cache': '',
+		'other/important.tmp': '',
+	})
+	assert walk(tmp_path) == [
+		'.gitignore',
+		'local',
+		'sub/.gitignore',
+		'sub/deeper/local',
+		'sub/important.tmp',
+		'x.cache',
+	]
+
+def test_nested_ignore_file_can_re_include_a_parent_rule_for_its_directory_only(tmp_path):
+	make_tree(tmp_path, {
+		'.gitignore': 'dist/\n',
+		'dist/bundle.js': '',
+		'pkg/.gitignore': '!dist/\n',
+		'pkg/dist/bundle.js': '',
+	})
+	assert walk(tmp_path) == ['.gitignore', 'pkg/.gitignore', 'pkg/dist/bundle.js']
+
+def test_assistantignore_is_read_next_to_gitignore(tmp_path):
+	make_tree(tmp_path, {
+		'.gitignore': '*.log\n',
+		'.assistantignore': 'secrets/\n',
+		'secrets/key.pem': '',
+		'app.log': '',
+		'app.py': '',
+	})
+	assert walk(tmp_path) == ['.assistantignore', '.gitignore', 'app.py']
+
+def test_explicit_rules_replace_the_defaults(tmp_path):
+	make_tree(tmp_path, {
+		'node_modules/pkg/index.js': '',
+		'main.py': '',
+		'main.pyc': '',
+	})
+	assert walk(tmp_path, IgnoreRules(['*.pyc'])) == ['main.py', 'node_modules/pkg/index.js']
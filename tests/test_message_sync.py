@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+from assistant_implementation_main import MessageSync
+
+class FakeMessages:
+	def __init__(self, message_ids):
+		self.messages = [SimpleNamespace(id=message_id, status='completed') for message_id in message_ids]
+
+	def list(self, thread_id, order='desc', after=None):
+		messages = list(self.messages)
+		if after is not None:
+			messages = messages[[message.id for message in messages].index(after) + 1:]
+		return messages
+
+def message_sync(tmp_path, message_ids):
+	client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(messages=FakeMessages(message_ids))))
+	return MessageSync(client, cursor_path=str(tmp_path / 'cursors.json'))
+
+def ids(messages):
+	return [message.id for message in messages]
+
+def test_uncommitted_messages_are_returned_again(tmp_path):
+	sync = message_sync(tmp_path, ['msg_1', 'msg_2'])
+	assert ids(sync.new_messages('thread_1')) == ['msg_1', 'msg_2']
+	assert ids(sync.new_messages('thread_1')) == ['msg_1', 'msg_2']
+
+def test_commit_moves_the_persisted_cursor(tmp_path):
+	sync = message_sync(tmp_path, ['msg_1', 'msg_2', 'msg_3'])
+	sync.new_messages('thread_1')
+	sync.commit('thread_1', 'msg_2')
+	assert ids(sync.new_messages('thread_1')) == ['msg_3']
+
+	reloaded = message_sync(tmp_path, ['msg_1', 'msg_2', 'msg_3'])
+	assert ids(reloaded.new_messages('thread_1')) == ['msg_3']
+	reloaded.commit('thread_1')
+	assert reloaded.new_messages('thread_1') == []
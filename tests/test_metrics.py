@@ -0,0 +1,42 @@
+import asyncio
+import os
+import httpx
+import pytest
+from assistant_implementation_main import AsyncInstrumentedTransport, ClientPool, DirectoryFile, MetricsRegistry
+from mock_server import MockAssistantsServer
+
+@pytest.fixture
+def server():
+	with MockAssistantsServer() as server:
+		yield server
+
+def test_chunked_upload_counts_bytes_sent(server, tmp_path):
+	project = tmp_path / 'project'
+	os.makedirs(project)
+	(project / 'data.bin').write_bytes(os.urandom(200000))
+
+	metrics = MetricsRegistry()
+	client_pool = ClientPool(metrics=metrics, base_url=server.base_url, api_key='test', max_retries=0)
+	try:
+		file_object = DirectoryFile(client_pool.client(), str(project), 'project.zip', 'assistants').file_object
+	finally:
+		client_pool.close()
+
+	# The multipart body wraps the archive, so at least the archive itself went over the wire
+	assert metrics.snapshot()['POST /files']['bytes_sent'] >= len(server.store.contents[file_object.id])
+
+def test_async_streamed_request_counts_bytes_sent(server):
+	metrics = MetricsRegistry()
+	chunks = [b'{"metadata": {"note": "', b'x' * 4000, b'"}}']
+
+	async def body():
+		for chunk in chunks:
+			yield chunk
+
+	async def main():
+		async with httpx.AsyncClient(transport=AsyncInstrumentedTransport(httpx.AsyncHTTPTransport(), metrics)) as client:
+			response = await client.post(f'{server.base_url}/threads', content=body())
+			assert response.status_code == 200
+
+	asyncio.run(main())
+	assert metrics.snapshot()['POST /threads']['bytes_sent'] == sum(map(len, chunks))
@@ -0,0 +1,98 @@
+import io
+import threading
+import httpx
+import os
+import socket
+import zipfile
+import pytest
+from assistant_implementation_main import ClientPool, DirectoryFile, MetricsRegistry
+import mock_server
+from mock_server import FaultInjector, MockAssistantsServer, MockError
+
+@pytest.fixture
+def server():
+	with MockAssistantsServer() as server:
+		yield server
+
+@pytest.fixture
+def client(server):
+	client_pool = ClientPool(metrics=MetricsRegistry(), base_url=server.base_url, api_key='test', max_retries=0)
+	yield client_pool.client()
+	client_pool.close()
+
+def test_streamed_directory_upload_is_accepted(server, client, tmp_path):
+	project = tmp_path / 'project'
+	os.makedirs(project / 'pkg')
+	(project / 'pkg' / 'module.py').write_bytes(b'print("hello")\n' * 5000)
+	(project / 'README.md').write_bytes(b'# project\n')
+
+	file_object = DirectoryFile(client, str(project), 'project.zip', 'assistants').file_object
+	with zipfile.ZipFile(io.BytesIO(server.store.contents[file_object.id])) as zipf:
+		assert zipf.testzip() is None
+		assert sorted(zipf.namelist()) == ['README.md', 'pkg/module.py']
+		assert zipf.read('pkg/module.py') == b'print("hello")\n' * 5000
+
+def test_rate_limit_budget_refills_per_second(monkeypatch):
+	clock = [1000.0]
+	monkeypatch.setattr(mock_server.time, 'monotonic', lambda: clock[0])
+	fault_injector = FaultInjector(requests_per_minute=60)
+
+	for _ in range(60):
+		fault_injector.before('POST /threads')
+	headers = fault_injector.headers()
+	assert headers['x-ratelimit-remaining-requests'] == '0'
+	assert headers['x-ratelimit-reset-requests'] == '60.000s'
+	with pytest.raises(MockError) as error:
+		fault_injector.before('POST /threads')
+	assert error.value.status == 429
+	assert error.value.headers['retry-after-ms'] == '1000'
+
+	clock[0] += 15
+	headers = fault_injector.headers()
+	assert headers['x-ratelimit-remaining-requests'] == '15'
+	assert headers['x-ratelimit-reset-requests'] == '45.000s'
+	for _ in range(15):
+		fault_injector.before('POST /threads')
+	with pytest.raises(MockError):
+		fault_injector.before('POST /threads')
+
+	clock[0] += 120
+	headers = fault_injector.headers()
+	assert headers['x-ratelimit-remaining-requests'] == '60'
+	assert headers['x-ratelimit-reset-requests'] == '0.000s'
+
+def test_truncated_chunked_body_is_not_accepted(server):
+	host, port = server.httpd.server_address[:2]
+	with socket.create_connection((host, port)) as connection:
+		# Two bytes of a JSON body, then the client goes away before the terminating chunk
+		connection.sendall(b'POST /v1/threads HTTP/1.1\r\nHost: mock\r\nContent-Type: application/json\r\nTransfer-Encoding: chunked\r\n\r\n2\r\n{}\r\n')
+		connection.shutdown(socket.SHUT_WR)
+		assert connection.recv(1024) == b''
+	assert server.store.threads == {}
+
+def test_streamed_directory_upload_raises_the_producer_error(server, client, tmp_path, monkeypatch):
+	thread_errors = []
+	monkeypatch.setattr(threading, 'excepthook', thread_errors.append)
+	project = tmp_path / 'project'
+	os.makedirs(project)
+	(project / 'README.md').write_bytes(b'# project\n')
+	os.symlink(tmp_path / 'missing.py', project / 'broken.py')
+
+	with pytest.raises(FileNotFoundError):
+		DirectoryFile(client, str(project), 'project.zip', 'assistants')
+	assert thread_errors == []
+	assert server.store.contents == {}
+
+@pytest.mark.parametrize('path, request_options, status', [
+	('/threads', {'content': b'{not json', 'headers': {'content-type': 'application/json'}}, 400),
+	('/files', {'data': {'purpose': 'assistants'}, 'files': {'other': ('a.txt', b'data')}}, 400),
+	('/threads', {'json': {}}, 500),
+])
+def test_handler_errors_become_json_responses(server, monkeypatch, path, request_options, status):
+	def broken(fields=None):
+		raise RuntimeError('store unavailable')
+	monkeypatch.setattr(server.store, 'add_thread', broken)
+
+	response = httpx.post(server.base_url + path, **request_options)
+	assert response.status_code == status
+	assert response.json()['error']['message']
@@ -0,0 +1,22 @@
+import httpx
+from assistant_implementation_main import RateLimitScheduler
+
+def response(path, status_code=200, **headers):
+	request = httpx.Request('GET', f'https://api.openai.com/v1{path}')
+	return httpx.Response(status_code, headers={name.replace('_', '-'): value for name, value in headers.items()}, request=request)
+
+def test_rate_follows_the_server_refill_rate():
+	scheduler = RateLimitScheduler()
+	scheduler.after_response(response('/threads/thread_1/runs/run_1', x_ratelimit_limit_requests='6000', x_ratelimit_remaining_requests='5000', x_ratelimit_reset_requests='5s'))
+	assert scheduler.buckets['runs'].rate == 200
+
+def test_one_header_sample_never_drops_the_rate_below_the_per_minute_limit():
+	scheduler = RateLimitScheduler()
+	scheduler.after_response(response('/threads/thread_1/runs/run_1', x_ratelimit_limit_requests='600', x_ratelimit_remaining_requests='594', x_ratelimit_reset_requests='59.9s'))
+	assert scheduler.buckets['runs'].rate == 10
+
+def test_exhausted_budget_pauses_only_its_endpoint_class():
+	scheduler = RateLimitScheduler()
+	scheduler.after_response(response('/files', x_ratelimit_limit_requests='100', x_ratelimit_remaining_requests='0', x_ratelimit_reset_requests='2s'))
+	assert scheduler.buckets['files'].reserve() > 1
+	assert scheduler.buckets['runs'].reserve() == 0
@@ -0,0 +1,39 @@
+import asyncio
+from types import SimpleNamespace
+from assistant_implementation_main import RunScheduler
+
+class FakeRuns:
+	def __init__(self, statuses):
+		self.statuses = {run_id: list(run_statuses) for run_id, run_statuses in statuses.items()}
+
+	async def retrieve(self, thread_id, run_id):
+		statuses = self.statuses[run_id]
+		status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+		return SimpleNamespace(id=run_id, thread_id=thread_id, status=status, required_action=None)
+
+def fake_client(statuses):
+	return SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=FakeRuns(statuses))))
+
+def test_watch_returns_terminal_run():
+	async def main():
+		scheduler = RunScheduler(fake_client({'run_1': ['queued', 'in_progress', 'completed']}), min_interval=0.01)
+		return await asyncio.wait_for(scheduler.watch('thread_1', 'run_1'), 5)
+	assert asyncio.run(main()).status == 'completed'
+
+def test_failing_listener_ends_its_watch_without_stalling_others():
+	def listener(run, previous_status):
+		raise ValueError('listener failed')
+
+	async def main():
+		scheduler = RunScheduler(fake_client({'run_1': ['queued', 'completed'], 'run_2': ['queued', 'completed']}), min_interval=0.01)
+		results = await asyncio.wait_for(asyncio.gather(
+			scheduler.watch('thread_1', 'run_1', listener),
+			scheduler.watch('thread_2', 'run_2'),
+			return_exceptions=True,
+		), 5)
+		return scheduler, results
+
+	scheduler, (failed, completed) = asyncio.run(main())
+	assert isinstance(failed, ValueError)
+	assert completed.status == 'completed'
+	assert scheduler.watched == {}
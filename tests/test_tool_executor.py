@@ -0,0 +1,63 @@
+import json
+import threading
+import time
+import pytest
+from assistant_implementation_main import ClientPool, MetricsRegistry, ToolExecutor, ToolRegistry
+from mock_server import MockAssistantsServer, MockAssistantsAPI, MockStore, RunScript
+
+def tool_step(*names):
+	return {'status': 'requires_action', 'tool_calls': [{'name': name, 'arguments': {'index': index}} for index, name in enumerate(names)]}
+
+@pytest.fixture
+def release():
+	release = threading.Event()
+	yield release
+	release.set()
+
+@pytest.fixture
+def registry(release):
+	registry = ToolRegistry()
+
+	@registry.register(timeout=0.5)
+	def work(index):
+		time.sleep(0.3)
+		return {'index': index}
+
+	@registry.register(timeout=0.3)
+	def hang(index):
+		release.wait()
+		return {'index': index}
+
+	return registry
+
+def run_to_completion(steps, registry, max_workers):
+	store = MockStore(RunScript(['queued', *steps, 'completed']))
+	with MockAssistantsServer(MockAssistantsAPI(store)) as server:
+		client_pool = ClientPool(metrics=MetricsRegistry(), base_url=server.base_url, api_key='test', max_retries=0)
+		try:
+			client = client_pool.client()
+			executor = ToolExecutor(client, registry, max_workers=max_workers)
+			assistant = client.beta.assistants.create(model='gpt-4-turbo-preview', name='tools')
+			thread = client.beta.threads.create()
+			run = client.beta.threads.runs.create(thread_id=thread.id, assistant_id=assistant.id)
+			while run.status not in ('completed', 'failed'):
+				run = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
+				executor.handle(run)
+			steps = list(client.beta.threads.runs.steps.list(thread_id=thread.id, run_id=run.id, order='asc'))
+		finally:
+			client_pool.close()
+	return [
+		[json.loads(tool_call.function.output) for tool_call in step.step_details.tool_calls]
+		for step in steps if step.step_details.type == 'tool_calls'
+	]
+
+def test_queued_calls_get_their_full_timeout(registry):
+	outputs = run_to_completion([tool_step('work', 'work', 'work', 'work')], registry, max_workers=2)
+	assert outputs == [[{'index': 0}, {'index': 1}, {'index': 2}, {'index': 3}]]
+
+def test_hung_calls_do_not_block_later_calls(registry):
+	outputs = run_to_completion([tool_step('hang', 'hang', 'work', 'missing'), tool_step('work', 'work')], registry, max_workers=2)
+	assert outputs == [
+		[{'error': 'hang timed out after 0.3s'}, {'error': 'hang timed out after 0.3s'}, {'index': 2}, {'error': 'Unknown tool: missing'}],
+		[{'index': 0}, {'index': 1}],
+	]
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+import pytest
+from assistant_implementation_main import StatusPrinter, TranscriptStore
+
+def message(message_id, text, created_at):
+	content = SimpleNamespace(type='text', text=SimpleNamespace(value=text, annotations=[]))
+	return SimpleNamespace(id=message_id, role='user', created_at=created_at, content=[content])
+
+@pytest.fixture
+def store(tmp_path):
+	store = TranscriptStore(str(tmp_path / 'transcripts'))
+	store.append('thread_1', [
+		message('msg_1', 'I uploaded file-abc yesterday', 1),
+		message('msg_2', "It says I can't open foo.bar", 2),
+		message('msg_3', 'Search AND replace, then "quote" it', 3),
+	])
+	return store
+
+def ids(records):
+	return [record['id'] for record in records]
+
+@pytest.mark.parametrize('query, expected', [
+	('file-abc', ['msg_1']),
+	("can't", ['msg_2']),
+	('foo.bar', ['msg_2']),
+	('AND', ['msg_3']),
+	('"quote', ['msg_3']),
+	('NEAR(', []),
+	('uploaded yesterday', ['msg_1']),
+])
+def test_search_treats_user_text_literally(store, query, expected):
+	assert ids(store.search(query)) == expected
+
+def test_empty_search_returns_nothing(store):
+	assert store.search('   ') == []
+
+def test_status_printer_reads_history_from_the_transcript_store(store, capsys):
+	def list_messages(thread_id, **options):
+		raise AssertionError('history and search must not call messages.list')
+
+	client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(messages=SimpleNamespace(list=list_messages))))
+	status_printer = StatusPrinter(SimpleNamespace(poll_client=client), None, None, transcript_store=store)
+	assert status_printer.message_sync.transcript_store is store
+
+	status_printer.history('thread_1')
+	status_printer.search('file-abc')
+	output = capsys.readouterr().out
+	assert output.count('msg_1') == 2
+	assert 'msg_2' in output and 'msg_3' in output